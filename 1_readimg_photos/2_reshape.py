@@ -1,4 +1,5 @@
 import cv2 as cv
+import image_cache
 
 #resizes images standalone video files and live video files
 def rescaleFrame(frame, scale = 0.75):
@@ -14,7 +15,8 @@ def changeRes(width, height):
     capture.set(3, width)       #3 references to width in capture class
     capture.set(4, height)      #4 references to height in capture class
 
-img = cv.imread('1_readimg_photos/Photos/cat.jpg')
+#decoded once, later runs memory map the cached pixels (see image_cache.py)
+img = image_cache.imread('1_readimg_photos/Photos/cat.jpg')
 cv.imshow('cat', img)
 
 #rescale image
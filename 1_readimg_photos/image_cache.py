@@ -0,0 +1,124 @@
+import glob
+import hashlib
+import os
+from collections import OrderedDict
+
+import cv2 as cv
+import numpy as np
+
+#decoded pixels live here as .npy files, next to the Photos folder
+CACHE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), ".image_cache")
+
+
+def rescale(img, scale):
+    #same resize as rescaleFrame in 2_reshape.py
+    width = int(img.shape[1] * scale)
+    height = int(img.shape[0] * scale)
+    return cv.resize(img, (width, height), interpolation=cv.INTER_AREA)
+
+
+class ImageCache:
+    """
+    cv.imread that decodes every image only once.
+
+    The first load of a file (at a given scale) decodes/resizes it and saves
+    the pixels as a .npy file; later loads - also from other runs - memory
+    map that file instead, so nothing is decoded and pages are only read as
+    they are touched. Cache files are keyed by the image's path, mtime and
+    size, so editing an image invalidates them.
+
+    Loaded arrays stay in an in-process LRU up to budget_bytes. They are
+    read-only memory maps: .copy() one before drawing on it.
+    """
+    def __init__(self, cache_dir=CACHE_DIR, budget_bytes=256 * 1024 * 1024):
+        self.cache_dir = cache_dir
+        self.budget_bytes = budget_bytes
+        self.bytes = 0
+        self.hits = 0        #served from the LRU
+        self.disk_hits = 0   #memory mapped from the .npy cache
+        self.decodes = 0     #had to decode (or resize)
+        self._lru = OrderedDict()
+
+    def _file(self, path, scale):
+        #<path hash>_<mtime/size hash>_<scale>.npy
+        st = os.stat(path)
+        name = hashlib.sha1(os.path.abspath(path).encode()).hexdigest()[:16]
+        version = hashlib.sha1(f"{st.st_mtime_ns}:{st.st_size}".encode()).hexdigest()[:12]
+        return os.path.join(self.cache_dir, f"{name}_{version}_{scale!r}.npy"), f"{name}_{version}"
+
+    def load(self, path, scale=1.0):
+        """
+        The image at path, rescaled by scale (1.0 = as decoded). None if it can't be read.
+        """
+        if not os.path.exists(path):
+            return None
+        cache_file, version = self._file(path, scale)
+
+        #1. already loaded in this process
+        img = self._lru.get(cache_file)
+        if img is not None:
+            self._lru.move_to_end(cache_file)
+            self.hits += 1
+            return img
+
+        #2. decoded by an earlier load or run
+        if os.path.exists(cache_file):
+            img = np.load(cache_file, mmap_mode="r")
+            self.disk_hits += 1
+        else:
+            #3. decode, or resize the cached full size image
+            if scale == 1.0:
+                pixels = cv.imread(path)
+                if pixels is None:
+                    return None
+            else:
+                pixels = rescale(self.load(path), scale)
+            self.decodes += 1
+            self._save(cache_file, version, pixels)
+            img = np.load(cache_file, mmap_mode="r")
+
+        self._remember(cache_file, img)
+        return img
+
+    def pyramid(self, path, levels=4, factor=0.5):
+        """
+        [full size, factor, factor^2, ...] versions of the image, all cached.
+        """
+        return [self.load(path, factor ** i) for i in range(levels)]
+
+    def _save(self, cache_file, version, pixels):
+        os.makedirs(self.cache_dir, exist_ok=True)
+        #drop cache files of earlier versions of this image (any scale)
+        name = version.split("_")[0]
+        for old in glob.glob(os.path.join(self.cache_dir, f"{name}_*.npy")):
+            if not os.path.basename(old).startswith(version + "_"):
+                os.remove(old)
+        #write then rename, so a half written file is never loaded
+        tmp = f"{cache_file}.{os.getpid()}.tmp"
+        with open(tmp, "wb") as f:
+            np.save(f, pixels)
+        os.replace(tmp, cache_file)
+
+    def _remember(self, cache_file, img):
+        self._lru[cache_file] = img
+        self.bytes += img.nbytes
+        #evict least recently used entries until we fit the budget again
+        while self.bytes > self.budget_bytes and len(self._lru) > 1:
+            _, old = self._lru.popitem(last=False)
+            self.bytes -= old.nbytes
+
+    def clear(self):
+        self._lru.clear()
+        self.bytes = 0
+
+    def stats(self):
+        return {"hits": self.hits, "disk_hits": self.disk_hits, "decodes": self.decodes,
+                "entries": len(self._lru), "bytes": self.bytes}
+
+
+#shared cache for scripts: img = image_cache.imread('1_readimg_photos/Photos/cat.jpg')
+_default = ImageCache()
+
+
+def imread(path, scale=1.0):
+    return _default.load(path, scale)
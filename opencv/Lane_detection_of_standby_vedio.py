@@ -1,16 +1,427 @@
+import time
+
 import cv2 
 import numpy as np
 import matplotlib.pyplot as plt
 
+from lane_runtime import LaneRuntime
+from lane_instrumentation import Instruments, NULL_INSTRUMENTS
+from lane_scheduler import DeadlineScheduler
+from lane_color_lut import ColorMaskLUT, hsv_range_mask
+from blackbox import BlackBoxRecorder
+
+
+
+class BirdsEyeWarp:
+    """
+    Reusable bird's eye transform for one frame size and trapezoid config.
+
+    M/Minv are computed once in __init__. Every output pixel of the warp
+    samples the source inside a fixed band of the frame (y >= 0.65h for the
+    default trapezoid), so warp() only reads that ROI and writes into a
+    preallocated output buffer instead of allocating a new frame each time.
+
+    The ROI is padded by a few pixels, so preprocessing only that region
+    (see LaneDetector roi_preprocess) and warping it with warp_region()
+    gives the same result as doing the whole frame: the HSV masks are per
+    pixel, and Canny only looks a couple of pixels around each edge.
+
+    NOTE: warp() returns the same buffer every call - copy it if you need
+    to keep a frame around.
+    """
+    def __init__(self, w, h, src_ratios, dst_ratios, pad=4):
+        self.size = (w, h)
+
+        src = np.float32([[w * fx, h * fy] for fx, fy in src_ratios])
+        dst = np.float32([[w * fx, h * fy] for fx, fy in dst_ratios])
+
+        self.M = cv2.getPerspectiveTransform(src, dst)
+        self.Minv = cv2.getPerspectiveTransform(dst, src)
+
+        # 1. Map the output corners back into the source. A perspective
+        # transform keeps straight lines straight, so their bounding box
+        # holds every source pixel the warp can sample.
+        corners = np.float32([[[0, 0]], [[w, 0]], [[0, h]], [[w, h]]])
+        back = cv2.perspectiveTransform(corners, self.Minv).reshape(-1, 2)
+
+        # 2. Pad (+1 for the bilinear neighbour) and clip to the frame
+        x0 = int(np.clip(np.floor(back[:, 0].min()) - pad, 0, w - 1))
+        x1 = int(np.clip(np.floor(back[:, 0].max()) + 2 + pad, 1, w))
+        y0 = int(np.clip(np.floor(back[:, 1].min()) - pad, 0, h - 1))
+        y1 = int(np.clip(np.floor(back[:, 1].max()) + 2 + pad, 1, h))
+        self.roi = (x0, y0, x1, y1)
+
+        # 3. Same warp, but expressed on ROI coordinates
+        shift = np.array([[1, 0, x0], [0, 1, y0], [0, 0, 1]], dtype=np.float64)
+        self.M_roi = self.M @ shift
+
+        self._out = {}
+
+    def warp(self, img):
+        """
+        Warps a full frame.
+        """
+        x0, y0, x1, y1 = self.roi
+        # Slicing is a view, so only the ROI is read
+        return self.warp_region(img[y0:y1, x0:x1])
+
+    def warp_region(self, src):
+        """
+        Warps an image that was already cropped to self.roi.
+        """
+        # Output buffer is allocated once per dtype/channel layout
+        layout = (src.dtype, src.shape[2:])
+        out = self._out.get(layout)
+        if out is None:
+            w, h = self.size
+            out = np.zeros((h, w) + src.shape[2:], dtype=src.dtype)
+            self._out[layout] = out
+
+        cv2.warpPerspective(src, self.M_roi, self.size, dst=out, flags=cv2.INTER_LINEAR)
+        return out
+
+
+class LanePixelIndex:
+    """
+    Nonzero pixels of a binary image, indexed for rectangle queries.
+
+    nonzero() returns pixels in row-major order, so the key y*w + x is
+    already sorted. For each row of a window the pixels with
+    x_low <= x < x_high are one contiguous run of that key, found with a
+    binary search. A window query therefore costs O(rows * log N) plus the
+    pixels it returns, instead of four boolean masks over every pixel.
+    """
+    def __init__(self, binary):
+        self.height, self.width = binary.shape[:2]
+        self.nonzeroy, self.nonzerox = binary.nonzero()
+        self.keys = self.nonzeroy.astype(np.int64) * self.width + self.nonzerox
+        # Prefix sums of x: the x sum of any run is two lookups
+        self.cumx = np.concatenate([[0], np.cumsum(self.nonzerox, dtype=np.int64)])
+
+    def _runs(self, y_low, y_high, x_low, x_high):
+        """
+        (ys, starts, ends) of the window's per row runs, or None if it's empty.
+        """
+        # Clamp so a row's key range can't spill into the next row
+        x_low = min(max(x_low, 0), self.width)
+        x_high = min(max(x_high, 0), self.width)
+        y_low = max(y_low, 0)
+        y_high = min(y_high, self.height)
+        if x_low >= x_high or y_low >= y_high:
+            return None
+
+        ys = np.arange(y_low, y_high, dtype=np.int64)
+        rows = ys * self.width
+        starts = np.searchsorted(self.keys, rows + x_low)
+        ends = np.searchsorted(self.keys, rows + x_high)
+        return ys, starts, ends
+
+    def window(self, y_low, y_high, x_low, x_high):
+        """
+        Indices (into nonzeroy/nonzerox, ascending) of the pixels with
+        y_low <= y < y_high and x_low <= x < x_high.
+        """
+        # 1. Per row start/end offsets of the x range
+        runs = self._runs(y_low, y_high, x_low, x_high)
+        if runs is None:
+            return np.empty(0, dtype=np.intp)
+        _, starts, ends = runs
+
+        # 2. Expand the runs into one index array
+        lens = ends - starts
+        total = int(lens.sum())
+        if total == 0:
+            return np.empty(0, dtype=np.intp)
+        offsets = np.repeat(starts - (np.cumsum(lens) - lens), lens)
+        return np.arange(total) + offsets
+
+    def window_rows(self, y_low, y_high, x_low, x_high):
+        """
+        Per row pixel counts and x sums of the same window, as
+        (ys, counts, xsums) - enough for a least squares fit (LaneFit) or
+        the window's mean x, without gathering a single pixel.
+        """
+        runs = self._runs(y_low, y_high, x_low, x_high)
+        if runs is None:
+            empty = np.empty(0, dtype=np.int64)
+            return empty, empty, empty
+        ys, starts, ends = runs
+        return ys, ends - starts, self.cumx[ends] - self.cumx[starts]
+
+
+class LaneFit:
+    """
+    Least squares fit of x = Ay^2 + By + C, built up from running sums.
+
+    The fit only needs the normal equation sums S_k = sum(w * y^k) and
+    T_k = sum(w * x * y^k), so pixels can be added a window (or a row) at
+    a time and solving is one 3x3 system - no concatenated pixel arrays
+    and no np.polyfit. y is divided by the image height first to keep
+    the powers of y well conditioned.
+
+    Once solved, the same coefficients are available in meters
+    (metric_fit) and the curvature radius is a closed form of those.
+    """
+    def __init__(self, height):
+        self.height = height
+        self.S = np.zeros(5)
+        self.T = np.zeros(3)
+        self.pixels = 0
+        self.rows = 0        # Rows with at least one (weighted) pixel
+
+    def add_rows(self, ys, counts, xsums, weight=1.0):
+        """
+        Adds whole rows: counts[i] pixels with x summing to xsums[i] at y = ys[i].
+        weight is a scalar or one weight per row.
+        """
+        if len(ys) == 0:
+            return
+        t = ys / self.height
+        wc = counts * weight
+        wx = xsums * weight
+        tk = np.ones_like(t)
+        for k in range(5):
+            self.S[k] += wc @ tk
+            if k < 3:
+                self.T[k] += wx @ tk
+            tk = tk * t
+        self.pixels += int(counts.sum())
+        self.rows += int(np.count_nonzero(wc))
+
+    def add_points(self, ys, xs, weight=None):
+        """
+        Adds single pixels. They are binned per row first (O(height) sums,
+        whatever the pixel count); weight is None or one weight per row.
+        """
+        counts = np.bincount(ys, minlength=self.height)
+        xsums = np.bincount(ys, weights=xs, minlength=self.height)
+        hit = np.flatnonzero(counts)
+        row_weight = 1.0 if weight is None else weight[hit]
+        self.add_rows(hit, counts[hit], xsums[hit], row_weight)
+
+    def solve(self):
+        """
+        Pixel space [A, B, C] (np.polyfit order), or None with fewer than
+        three distinct rows.
+        """
+        if self.rows < 3:
+            return None
+        S, T = self.S, self.T
+        normal = np.array([[S[4], S[3], S[2]],
+                           [S[3], S[2], S[1]],
+                           [S[2], S[1], S[0]]])
+        a, b, c = np.linalg.solve(normal, T[::-1])
+        return np.array([a / self.height**2, b / self.height, c])
+
+    @staticmethod
+    def metric_fit(fit, ym_per_pix, xm_per_pix):
+        """
+        Pixel space fit -> the same curve in meters (x_m as a function of y_m).
+        """
+        return np.asarray(fit) * np.array([xm_per_pix / ym_per_pix**2, xm_per_pix / ym_per_pix, xm_per_pix])
+
+    @staticmethod
+    def curvature_radius(fit_m, y_m):
+        """
+        Radius of curvature in meters at y_m, from a metric_fit.
+        R = (1 + (2Ay + B)^2)^1.5 / |2A|; inf for a straight line.
+        """
+        A, B = fit_m[0], fit_m[1]
+        if A == 0:
+            return float("inf")
+        return float((1 + (2*A*y_m + B)**2)**1.5 / abs(2*A))
+
+
+class ResolutionController:
+    """
+    Picks the processing scale that keeps the pipeline inside a latency budget.
+
+    Tracks a smoothed frame time. Above the budget it steps down to the
+    next smaller scale. It steps back up only when the predicted time at
+    the bigger scale (cost ~ pixel count, i.e. scale^2) still leaves
+    `headroom` of the budget free. After every change it waits `settle`
+    frames so the new timing can show up before deciding again.
+
+    The default ladder stops at 0.5: on synthetic_road at 1280x720, results
+    there stay within about 6 cm and 3 degrees of native resolution, while
+    at 0.375 and below the fits get too noisy (up to 8 cm / 5.5 degrees).
+    """
+    def __init__(self, budget_ms, scales=(1.0, 0.75, 0.5),
+                 alpha=0.2, headroom=0.8, settle=10):
+        self.budget_ms = budget_ms
+        self.scales = sorted(scales, reverse=True)
+        self.alpha = alpha
+        self.headroom = headroom
+        self.settle = settle
+
+        self.level = 0              # Index into scales, 0 = biggest
+        self.avg_ms = None
+        self._cooldown = 0
+
+    @property
+    def scale(self):
+        return self.scales[self.level]
+
+    def update(self, frame_ms):
+        if self.avg_ms is None:
+            self.avg_ms = frame_ms
+        else:
+            self.avg_ms = self.alpha * frame_ms + (1 - self.alpha) * self.avg_ms
+
+        if self._cooldown > 0:
+            self._cooldown -= 1
+            return self.scale
+
+        if self.avg_ms > self.budget_ms and self.level < len(self.scales) - 1:
+            self._change(self.level + 1)
+        elif self.level > 0:
+            bigger = self.scales[self.level - 1]
+            predicted = self.avg_ms * (bigger / self.scale) ** 2
+            if predicted < self.budget_ms * self.headroom:
+                self._change(self.level - 1)
+        return self.scale
+
+    def _change(self, level):
+        old = self.scale
+        self.level = level
+        self.avg_ms *= (self.scale / old) ** 2  # Best guess until new timings arrive
+        self._cooldown = self.settle
 
 
 class LaneDetector:
-    def __init__(self):
+    def __init__(self, tracking=False, instrument=False, roi_preprocess=False, latency_budget_ms=None,
+                 color_lut=False):
         # Define conversion variables (approximate for standard roads)
         # ym_per_pix: meters per pixel in y dimension
         # xm_per_pix: meters per pixel in x dimension
         self.ym_per_pix = 30/720 
         self.xm_per_pix = 3.7/700 
+
+        # Trapezoid config for the bird's eye view, as (x, y) fractions of
+        # the frame size: Top Left, Top Right, Bottom Left, Bottom Right
+        self.src_ratios = ((0.45, 0.65), (0.55, 0.65), (0.1, 1.0), (0.9, 1.0))
+        self.dst_ratios = ((0.2, 0.0), (0.8, 0.0), (0.2, 1.0), (0.8, 1.0))
+
+        # One BirdsEyeWarp per (h, w, src_ratios, dst_ratios)
+        self._warpers = {}
+
+        # roi_preprocess=True: only preprocess the part of the frame the
+        # bird's eye warp actually reads (about the bottom third)
+        self.roi_preprocess = roi_preprocess
+
+        # HSV ranges (lower, upper) for Yellow and White lane paint
+        # Note: These need tuning based on lighting!
+        self.color_ranges = (
+            ((15, 100, 100), (30, 255, 255)),   # Yellow
+            ((0, 0, 200), (180, 30, 255)),      # White
+        )
+
+        # color_lut=True: look masks up in a table compiled from color_ranges
+        # (lane_color_lut) instead of converting every frame to HSV. Same
+        # masks; the table is cached on disk and rebuilt if the ranges change.
+        self.color_lut = color_lut
+        self._color_luts = {}
+
+        # Sliding window hyperparameters
+        self.nwindows = 9
+        self.margin = 100
+        self.minpix = 50
+        # Optional weight per window in the lane fits, bottom window first
+        # (e.g. np.linspace(1.0, 0.5, 9) trusts the near road more)
+        self.window_weights = None
+
+        # Tracking mode: search around last frame's fit instead of a
+        # full sliding window search every frame
+        self.tracking = tracking
+        self.min_lane_pixels = 200   # Fewer pixels than this = low confidence
+        self.max_misses = 5          # Hold the old fit this many frames, then re-search
+        self.smoothing = 0.3         # Weight of the new fit (1.0 = no smoothing)
+        self.reset_tracking()
+
+        # Stage timers / counters (see lane_instrumentation). When off, the
+        # hooks are empty calls, so the cost is negligible.
+        self.instruments = Instruments() if instrument else NULL_INSTRUMENTS
+
+        # Adaptive resolution: with a latency budget, frames are downscaled
+        # (INTER_AREA, like rescaleFrame) until the pipeline fits in it.
+        # The pixel-based parameters above are native-resolution values and
+        # are rescaled together with the metric conversions (set_scale), so
+        # offset/heading keep their units at any scale - their accuracy
+        # still drops with the pixel count (see ResolutionController).
+        self.scale = 1.0
+        self._native = None
+        self.last_fits = (None, None)
+        self.last_height = None
+        self.resolution = ResolutionController(latency_budget_ms) if latency_budget_ms else None
+
+    def set_scale(self, scale):
+        """
+        Switches the processing scale (1.0 = native resolution).
+        """
+        if self._native is None:
+            self._native = {
+                "margin": self.margin, "minpix": self.minpix,
+                "min_lane_pixels": self.min_lane_pixels,
+                "xm_per_pix": self.xm_per_pix, "ym_per_pix": self.ym_per_pix,
+            }
+        n = self._native
+
+        # Windows and pixel counts shrink with the image...
+        self.margin = max(1, int(round(n["margin"] * scale)))
+        self.minpix = max(1, int(round(n["minpix"] * scale)))
+        self.min_lane_pixels = max(1, int(round(n["min_lane_pixels"] * scale)))
+        # ...while each pixel covers more meters
+        self.xm_per_pix = n["xm_per_pix"] / scale
+        self.ym_per_pix = n["ym_per_pix"] / scale
+
+        # Tracked fits live in pixel space: x = Ay^2 + By + C, with x, y
+        # both scaled by r gives x = (A/r)y^2 + By + rC
+        r = scale / self.scale
+        if self.left_fit is not None:
+            self.left_fit = self.left_fit * np.array([1 / r, 1, r])
+            self.right_fit = self.right_fit * np.array([1 / r, 1, r])
+
+        self.scale = scale
+
+    def native_fits(self):
+        """
+        Fits found by the last run_pipeline, in native-resolution pixels.
+        (None, None) if it found no lanes in that frame - a fit the tracker
+        only held over from earlier frames doesn't count.
+        """
+        left_fit, right_fit = self.last_fits
+        if left_fit is None or self.scale == 1.0:
+            return left_fit, right_fit
+        # Inverse of the set_scale conversion, with r = 1 / scale
+        to_native = np.array([self.scale, 1, 1 / self.scale])
+        return left_fit * to_native, right_fit * to_native
+
+    def lane_geometry(self):
+        """
+        The last run_pipeline's fits in meters, and each lane's radius of
+        curvature (m) at the bottom of the image. None if it found no lanes.
+        Scale independent: xm/ym_per_pix follow set_scale.
+        """
+        left_fit, right_fit = self.last_fits
+        if left_fit is None:
+            return None
+        left_m = LaneFit.metric_fit(left_fit, self.ym_per_pix, self.xm_per_pix)
+        right_m = LaneFit.metric_fit(right_fit, self.ym_per_pix, self.xm_per_pix)
+        y_m = self.last_height * self.ym_per_pix
+        return {
+            "left_fit_m": left_m,
+            "right_fit_m": right_m,
+            "left_radius_m": LaneFit.curvature_radius(left_m, y_m),
+            "right_radius_m": LaneFit.curvature_radius(right_m, y_m),
+        }
+
+    def reset_tracking(self):
+        """
+        Forget the previous fits, so the next frame does a full search.
+        """
+        self.left_fit = None
+        self.right_fit = None
+        self.misses = 0
         
     def preprocess(self, img):
         """
@@ -18,75 +429,65 @@ class LaneDetector:
         2. Mask Yellow/White
         3. Canny Edge Detection
         """
-        hsv = cv2.cvtColor(img, cv2.COLOR_BGR2HSV)
-        
-        # Define ranges for White and Yellow
-        # Note: These need tuning based on lighting!
-        lower_yellow = np.array([15, 100, 100])
-        upper_yellow = np.array([30, 255, 255])
-        
-        lower_white = np.array([0, 0, 200])
-        upper_white = np.array([180, 30, 255])
-        
-        mask_yellow = cv2.inRange(hsv, lower_yellow, upper_yellow)
-        mask_white = cv2.inRange(hsv, lower_white, upper_white)
-        
-        combined_mask = cv2.bitwise_or(mask_yellow, mask_white)
+        combined_mask = self.color_mask(img)
         
         # Edge Detection
         edges = cv2.Canny(combined_mask, 50, 150)
         
         return edges
 
+    def color_mask(self, img):
+        """
+        Yellow/White lane mask (steps 1 and 2 of preprocess).
+        Works per pixel, so img may be several frames stacked on top of each other.
+        """
+        if not self.color_lut:
+            return hsv_range_mask(img, self.color_ranges)
+
+        lut = self._color_luts.get(self.color_ranges)
+        if lut is None:
+            lut = self._color_luts[self.color_ranges] = ColorMaskLUT(self.color_ranges)
+        return lut.apply(img)
+
     def perspective_transform(self, img):
         """
         Warps the image to a bird's eye view.
+        The matrices are built once per frame size (see BirdsEyeWarp),
+        so each frame only pays for the warp of the road ROI.
         """
         h, w = img.shape[:2]
-        
-        # Define source points (Trapezoid on the road)
-        src = np.float32([
-            [w * 0.45, h * 0.65],  # Top Left
-            [w * 0.55, h * 0.65],  # Top Right
-            [w * 0.1, h],          # Bottom Left
-            [w * 0.9, h]           # Bottom Right
-        ])
-        
-        # Define destination points (Rectangle)
-        dst = np.float32([
-            [w * 0.2, 0],
-            [w * 0.8, 0],
-            [w * 0.2, h],
-            [w * 0.8, h]
-        ])
-        
-        M = cv2.getPerspectiveTransform(src, dst)
-        Minv = cv2.getPerspectiveTransform(dst, src)
-        warped = cv2.warpPerspective(img, M, (w, h), flags=cv2.INTER_LINEAR)
-        
-        return warped, Minv
+        warper = self.get_warper(w, h)
+        warped = warper.warp(img)
+
+        return warped, warper.Minv
+
+    def get_warper(self, w, h):
+        """
+        The cached BirdsEyeWarp for this frame size and trapezoid config.
+        """
+        key = (h, w, self.src_ratios, self.dst_ratios)
+
+        warper = self._warpers.get(key)
+        if warper is None:
+            warper = BirdsEyeWarp(w, h, self.src_ratios, self.dst_ratios)
+            self._warpers[key] = warper
+        return warper
 
     def find_lane_pixels(self, binary_warped):
         """
         Uses Histogram and Sliding Windows to find lane pixels.
         """
-        # Take a histogram of the bottom half of the image
-        histogram = np.sum(binary_warped[binary_warped.shape[0]//2:, :], axis=0)
-        
-        # Find the peak of the left and right halves of the histogram
-        midpoint = int(histogram.shape[0]//2)
-        leftx_base = np.argmax(histogram[:midpoint])
-        rightx_base = np.argmax(histogram[midpoint:]) + midpoint
+        leftx_base, rightx_base = self._lane_bases(binary_warped)
 
         # Setup sliding window hyperparameters
-        nwindows = 9
-        margin = 100
-        minpix = 50
+        nwindows = self.nwindows
+        margin = self.margin
+        minpix = self.minpix
         
         window_height = int(binary_warped.shape[0]//nwindows)
-        nonzero = binary_warped.nonzero()
-        nonzeroy = np.array(nonzero[0])
-        nonzerox = np.array(nonzero[1])
+        index = LanePixelIndex(binary_warped)
+        nonzeroy = index.nonzeroy
+        nonzerox = index.nonzerox
         
         leftx_current = leftx_base
         rightx_current = rightx_base
@@ -105,10 +506,8 @@ class LaneDetector:
             win_xright_high = rightx_current + margin
             
             # Identify the nonzero pixels in x and y within the window
-            good_left_inds = ((nonzeroy >= win_y_low) & (nonzeroy < win_y_high) & 
-                            (nonzerox >= win_xleft_low) & (nonzerox < win_xleft_high)).nonzero()[0]
-            good_right_inds = ((nonzeroy >= win_y_low) & (nonzeroy < win_y_high) & 
-                            (nonzerox >= win_xright_low) & (nonzerox < win_xright_high)).nonzero()[0]
+            good_left_inds = index.window(win_y_low, win_y_high, win_xleft_low, win_xleft_high)
+            good_right_inds = index.window(win_y_low, win_y_high, win_xright_low, win_xright_high)
             
             left_lane_inds.append(good_left_inds)
             right_lane_inds.append(good_right_inds)
@@ -129,18 +528,160 @@ class LaneDetector:
         
         return leftx, lefty, rightx, righty
 
+    def _lane_bases(self, binary_warped):
+        # Take a histogram of the bottom half of the image
+        histogram = np.sum(binary_warped[binary_warped.shape[0]//2:, :], axis=0)
+        
+        # Find the peak of the left and right halves of the histogram
+        midpoint = int(histogram.shape[0]//2)
+        leftx_base = np.argmax(histogram[:midpoint])
+        rightx_base = np.argmax(histogram[midpoint:]) + midpoint
+        return leftx_base, rightx_base
+
+    def fit_lane_windows(self, binary_warped):
+        """
+        The sliding window search of find_lane_pixels, feeding each window
+        straight into a LaneFit (per row counts and x sums from the index)
+        instead of collecting pixel indices. Windows are weighted by
+        window_weights. Returns (left LaneFit, right LaneFit).
+        """
+        h = binary_warped.shape[0]
+        window_height = int(h//self.nwindows)
+        index = LanePixelIndex(binary_warped)
+        left = LaneFit(h)
+        right = LaneFit(h)
+
+        current = list(self._lane_bases(binary_warped))
+        for window in range(self.nwindows):
+            win_y_low = h - (window+1)*window_height
+            win_y_high = h - window*window_height
+            weight = 1.0 if self.window_weights is None else self.window_weights[window]
+
+            for side, fit in enumerate((left, right)):
+                ys, counts, xsums = index.window_rows(win_y_low, win_y_high,
+                                                      current[side] - self.margin,
+                                                      current[side] + self.margin)
+                fit.add_rows(ys, counts, xsums, weight)
+
+                # Recenter next window on their mean position
+                n = counts.sum()
+                if n > self.minpix:
+                    current[side] = int(xsums.sum() // n)
+
+        return left, right
+
+    def _row_weights(self, h):
+        """
+        window_weights spread out to one weight per image row (None if unset).
+        """
+        if self.window_weights is None:
+            return None
+        window_height = int(h//self.nwindows)
+        # Rows above the top window belong to no window; give them its weight
+        window = np.minimum((h - 1 - np.arange(h)) // window_height, self.nwindows - 1)
+        return np.asarray(self.window_weights, dtype=np.float64)[window]
+
+    def search_around_poly(self, binary_warped):
+        """
+        Finds lane pixels within +/- margin of the previous frame's fits.
+        Much cheaper than the sliding windows when the lanes barely move.
+        """
+        nonzero = binary_warped.nonzero()
+        nonzeroy = np.array(nonzero[0])
+        nonzerox = np.array(nonzero[1])
+
+        left_center = np.polyval(self.left_fit, nonzeroy)
+        right_center = np.polyval(self.right_fit, nonzeroy)
+
+        left_lane_inds = np.abs(nonzerox - left_center) < self.margin
+        right_lane_inds = np.abs(nonzerox - right_center) < self.margin
+
+        leftx = nonzerox[left_lane_inds]
+        lefty = nonzeroy[left_lane_inds]
+        rightx = nonzerox[right_lane_inds]
+        righty = nonzeroy[right_lane_inds]
+
+        return leftx, lefty, rightx, righty
+
     def fit_polynomial(self, binary_warped):
-        leftx, lefty, rightx, righty = self.find_lane_pixels(binary_warped)
+        """
+        Fits x = Ay^2 + By + C to each lane. Returns (left_fit, right_fit,
+        lanes) with lanes the pair of LaneFits behind them; lanes is None
+        when nothing was measured this frame.
+        """
+        rec = self.instruments
+        t = rec.start()
 
-        # Fit a second order polynomial to each
-        # y = Ax^2 + Bx + C
-        if len(leftx) == 0 or len(rightx) == 0:
-            return None, None, None # Error handling if no lines found
-            
-        left_fit = np.polyfit(lefty, leftx, 2)
-        right_fit = np.polyfit(righty, rightx, 2)
-        
-        return left_fit, right_fit, (leftx, lefty, rightx, righty)
+        if not self.tracking:
+            lanes = self.fit_lane_windows(binary_warped)
+            t = rec.lap("search", t)
+            rec.observe("lane_pixels", lanes[0].pixels + lanes[1].pixels)
+
+            # Fit a second order polynomial to each
+            # y = Ax^2 + Bx + C
+            left_fit, right_fit = lanes[0].solve(), lanes[1].solve()
+            if left_fit is None or right_fit is None:
+                rec.count("no_lanes")
+                return None, None, None # Error handling if no lines found
+            rec.lap("fit", t)
+
+            return left_fit, right_fit, lanes
+
+        # --- Tracking mode ---
+        # 1. Cheap search around the previous fit, if we have one
+        lanes = None
+        if self.left_fit is not None:
+            leftx, lefty, rightx, righty = self.search_around_poly(binary_warped)
+            h = binary_warped.shape[0]
+            row_weights = self._row_weights(h)
+            lanes = (LaneFit(h), LaneFit(h))
+            lanes[0].add_points(lefty, leftx, row_weights)
+            lanes[1].add_points(righty, rightx, row_weights)
+            if not self._confident(lanes):
+                lanes = None
+
+        # 2. No prior fit, or confidence dropped: full sliding window search
+        if lanes is None:
+            if self.left_fit is not None:
+                rec.count("fallback")
+            lanes = self.fit_lane_windows(binary_warped)
+            if not self._confident(lanes):
+                rec.lap("search", t)
+                rec.count("miss")
+                return self._miss()
+        t = rec.lap("search", t)
+
+        rec.observe("lane_pixels", lanes[0].pixels + lanes[1].pixels)
+        left_fit = lanes[0].solve()
+        right_fit = lanes[1].solve()
+
+        # 3. Smooth across frames to stop jitter
+        if self.left_fit is None:
+            self.left_fit, self.right_fit = left_fit, right_fit
+        else:
+            a = self.smoothing
+            self.left_fit = a * left_fit + (1 - a) * self.left_fit
+            self.right_fit = a * right_fit + (1 - a) * self.right_fit
+        self.misses = 0
+        rec.lap("fit", t)
+
+        return self.left_fit, self.right_fit, lanes
+
+    def _confident(self, lanes):
+        left, right = lanes
+        return (left.pixels >= self.min_lane_pixels and left.rows >= 3 and
+                right.pixels >= self.min_lane_pixels and right.rows >= 3)
+
+    def _miss(self):
+        """
+        No usable lanes this frame: keep the old fit for a few frames,
+        then give up on it so the next frame starts from scratch.
+        """
+        self.misses += 1
+        if self.left_fit is None or self.misses >= self.max_misses:
+            self.reset_tracking()
+            return None, None, None
+        return self.left_fit, self.right_fit, None
 
     def calculate_data(self, binary_warped, left_fit, right_fit):
         """
@@ -176,21 +717,177 @@ class LaneDetector:
         
         return offset, heading_angle_deg
 
+    def run_batch(self, frames):
+        """
+        Lane detection for N same-size frames at once (e.g. the left, center
+        and right cameras of fusion_system.py), given as one (N, h, w, 3) array.
+
+        Masking runs as a single call over the stacked frames and the
+        histogram, base detection, sliding windows and fits are NumPy
+        operations over the whole batch, so the Python work per tick no
+        longer grows with the number of cameras. Canny and the warp still
+        run per frame, and with masking they are most of the tick: at 720p
+        three cameras take about 54 ms batched against 62-66 ms for three
+        run_pipeline calls (benchmarks.py). Same results as run_pipeline without tracking or
+        adaptive resolution (windows are weighted by window_weights the
+        same way).
+
+        Returns (offsets, headings, valid) arrays of length N; valid is
+        False where a lane wasn't found, and its offset/heading are 0.
+        """
+        frames = np.asarray(frames)
+        n, h, w = frames.shape[:3]
+        warper = self.get_warper(w, h)
+        x0, y0, x1, y1 = warper.roi
+
+        # 1. Colour mask of the whole stack in one call
+        if self.roi_preprocess:
+            frames = frames[:, y0:y1, x0:x1]
+        stack = np.ascontiguousarray(frames)
+        masks = self.color_mask(stack.reshape(-1, stack.shape[2], 3)).reshape(stack.shape[:3])
+
+        # 2. Edges + bird's eye view, frame by frame into one (N, h, w) buffer
+        warped = np.empty((n, h, w), dtype=np.uint8)
+        for i in range(n):
+            edges = cv2.Canny(masks[i], 50, 150)
+            if not self.roi_preprocess:
+                edges = edges[y0:y1, x0:x1]
+            cv2.warpPerspective(edges, warper.M_roi, (w, h), dst=warped[i], flags=cv2.INTER_LINEAR)
+
+        # 3. Histogram peaks for every camera at once
+        histogram = np.sum(warped[:, h//2:, :], axis=1)
+        midpoint = w // 2
+        current = np.stack([np.argmax(histogram[:, :midpoint], axis=1),
+                            np.argmax(histogram[:, midpoint:], axis=1) + midpoint], axis=1)  # (N, 2)
+
+        # 4. The stack as one tall image: rows b*h + y, so y*w + x keys stay
+        # sorted and every window row is one binary-searched run (as in
+        # LanePixelIndex). Prefix sums of x give each run's sum without
+        # gathering its pixels. cv2.findNonZero lists the same pixels in the
+        # same order as ndarray.nonzero(), several times faster.
+        points = cv2.findNonZero(warped.reshape(n * h, w))
+        points = np.empty((0, 2), dtype=np.int32) if points is None else points.reshape(-1, 2)
+        xs, rows = points[:, 0], points[:, 1]
+        keys = rows.astype(np.int64) * w + xs
+        cumx = np.concatenate([[0], np.cumsum(xs, dtype=np.int64)])
+
+        # Least squares sums for x = a*t^2 + b*t + c with t = y/h (scaled
+        # for conditioning): S[k] = sum t^k, T[k] = sum x*t^k
+        S = np.zeros((n, 2, 5))
+        T = np.zeros((n, 2, 3))
+        found_rows = np.zeros((n, 2), dtype=np.int64)
+
+        window_height = int(h // self.nwindows)
+        base_rows = np.arange(n, dtype=np.int64)[:, None] * h
+        for window in range(self.nwindows):
+            win_y_low = h - (window+1)*window_height
+            win_y_high = h - window*window_height
+            weight = 1.0 if self.window_weights is None else self.window_weights[window]
+            ys = np.arange(max(win_y_low, 0), win_y_high)
+            row_keys = ((base_rows + ys) * w)[:, None, :]                     # (N, 1, rows)
+
+            x_low = np.clip(current - self.margin, 0, w)[:, :, None]          # (N, 2, 1)
+            x_high = np.clip(current + self.margin, 0, w)[:, :, None]
+            starts = np.searchsorted(keys, row_keys + x_low)                  # (N, 2, rows)
+            ends = np.searchsorted(keys, row_keys + x_high)
+            ends = np.maximum(ends, starts)
+
+            counts = ends - starts
+            sums = cumx[ends] - cumx[starts]
+
+            t = ys / h
+            for k in range(5):
+                S[:, :, k] += (counts * weight) @ t**k
+            for k in range(3):
+                T[:, :, k] += (sums * weight) @ t**k
+            found_rows += np.count_nonzero(counts * weight, axis=2)
+
+            # Recenter next window on their mean position
+            total = counts.sum(axis=2)
+            recenter = total > self.minpix
+            current = np.where(recenter, sums.sum(axis=2) // np.maximum(total, 1), current)
+
+        # 5. Solve all 2N 3x3 systems at once (need 3 distinct rows for a parabola)
+        ok = found_rows >= 3
+        A = np.stack([S[..., 4], S[..., 3], S[..., 2],
+                      S[..., 3], S[..., 2], S[..., 1],
+                      S[..., 2], S[..., 1], S[..., 0]], axis=-1).reshape(n, 2, 3, 3)
+        A[~ok] = np.eye(3)
+        coef = np.linalg.solve(A, T[..., ::-1][..., None])[..., 0]           # (N, 2, [a, b, c])
+        fits = coef / np.array([h * h, h, 1.0])                              # back to pixel y
+
+        # 6. Offset and heading at the bottom of the image (as calculate_data)
+        y_eval = h
+        x_pos = fits[..., 0]*y_eval**2 + fits[..., 1]*y_eval + fits[..., 2]
+        slope = 2*fits[..., 0]*y_eval + fits[..., 1]
+
+        valid = ok.all(axis=1)
+        offsets = np.where(valid, (x_pos.mean(axis=1) - w / 2) * self.xm_per_pix, 0.0)
+        headings = np.where(valid, np.degrees(np.arctan(slope.mean(axis=1))), 0.0)
+
+        return offsets, headings, valid
+
     def run_pipeline(self, frame):
-        # 1. Edge Detection & Masking
-        edges = self.preprocess(frame)
-        
-        # 2. Perspective Transform
-        warped, Minv = self.perspective_transform(edges)
+        if self.resolution is None:
+            return self._run(frame)
+
+        start = time.perf_counter()
+
+        # 1. Downscale to the scale the controller picked last frame
+        scale = self.resolution.scale
+        if scale != self.scale:
+            self.set_scale(scale)
+        if scale != 1.0:
+            h, w = frame.shape[:2]
+            frame = cv2.resize(frame, (int(w * scale), int(h * scale)), interpolation=cv2.INTER_AREA)
+
+        # 2. Run as usual - parameters are already scaled
+        result = self._run(frame)
+
+        # 3. Let the controller see how long this frame took
+        self.resolution.update((time.perf_counter() - start) * 1000)
+        return result
+
+    def _run(self, frame):
+        rec = self.instruments
+        t_frame = t = rec.start()
+
+        if self.roi_preprocess:
+            # 1. Edge Detection & Masking, on the road ROI only
+            warper = self.get_warper(frame.shape[1], frame.shape[0])
+            x0, y0, x1, y1 = warper.roi
+            edges = self.preprocess(frame[y0:y1, x0:x1])
+            t = rec.lap("preprocess", t)
+
+            # 2. Perspective Transform (maps ROI coordinates back to the full view)
+            warped, Minv = warper.warp_region(edges), warper.Minv
+            t = rec.lap("warp", t)
+        else:
+            # 1. Edge Detection & Masking
+            edges = self.preprocess(frame)
+            t = rec.lap("preprocess", t)
+            
+            # 2. Perspective Transform
+            warped, Minv = self.perspective_transform(edges)
+            t = rec.lap("warp", t)
+        if rec.enabled:
+            rec.observe("nonzero", cv2.countNonZero(warped))
         
-        # 3. Fit Lanes
-        left_fit, right_fit, pixel_data = self.fit_polynomial(warped)
+        # 3. Fit Lanes (times "search" and "fit" itself)
+        left_fit, right_fit, lanes = self.fit_polynomial(warped)
+        # lanes is None when tracking only held on to an old fit
+        self.last_fits = (left_fit, right_fit) if lanes is not None else (None, None)
+        self.last_height = warped.shape[0]
+        t = rec.start()
         
         if left_fit is not None and right_fit is not None:
             # 4. Calculate Data
             offset, heading = self.calculate_data(warped, left_fit, right_fit)
+            rec.lap("metrics", t)
+            rec.end_frame(t_frame)
             return offset, heading, warped
         else:
+            rec.end_frame(t_frame)
             return 0, 0, warped
 
 # --- Usage Example ---
@@ -204,7 +901,12 @@ class LaneDetector:
 # --- MAIN EXECUTION ---
 if __name__ == "__main__":
     # 1. Initialize the "Brain" (Create an instance of your class)
-    detector = LaneDetector()
+    # tracking=True: reuse the last frame's fit instead of a full search
+    # instrument=True: stage timers + FPS/latency HUD (stats saved on exit)
+    # roi_preprocess=True: only mask/edge-detect the road part of the frame
+    # latency_budget_ms=30: drop the processing resolution if we can't keep up with 30 fps
+    detector = LaneDetector(tracking=True, instrument=True, roi_preprocess=True,
+                            latency_budget_ms=30)
 
     # 2. Initialize the "Eyes" (Open the USB Camera)
     # Using index 1 and DSHOW based on our troubleshooting
@@ -216,31 +918,69 @@ if __name__ == "__main__":
 
     print("Starting Lane Detection... Press 'q' to exit.")
 
-    while True:
-        # 3. Read a frame from the camera
-        ret, frame = cap.read()
-        if not ret:
-            print("Failed to grab frame")
-            break
+    # 3. Capture and detection run on their own threads (see lane_runtime).
+    # Bounded queues drop stale frames so we always work on the newest one.
+    # The scheduler only runs detection when it fits the frame deadline (or
+    # confidence dropped) and fills the other frames in with a Kalman estimate
+    scheduler = DeadlineScheduler(detector, budget_ms=33)
+    # Predicted frames come out in quick bursts, so give the display a
+    # little more slack than the capture queue to not lose measured ones
+    runtime = LaneRuntime(cap, detector, queue_size=1, policy="drop_oldest",
+                          scheduler=scheduler, result_queue_size=3).start()
+
+    # Black box (off by default - the ring holds ~19 s of raw frames, about
+    # 0.5 GB at 640x480): the last seconds of the driver view stay in a ring
+    # file, a lane departure saves a clip around it (created on the first
+    # frame, once the frame size is known)
+    BLACKBOX_ENABLED = False
+    BLACKBOX_FILE = "lane_blackbox.ring"
+    LANE_DEPARTURE_M = 0.8
+    blackbox = None
 
-        # 4. Feed the frame to the pipeline
-        # Returns: offset (meters), heading (degrees), and the bird's eye view image
-        offset, heading, warped_view = detector.run_pipeline(frame)
+    # 4. Display stage: runs here, on the main thread
+    # Each result has offset (meters), heading (degrees) and the bird's eye view image
+    for result in runtime.results():
+        frame = result["frame"]
+        offset, heading = result["offset"], result["heading"]
 
         # 5. Visualize the Data
         # Let's write the numbers directly on the video so we can see them
-        cv2.putText(frame, f"Offset: {offset:.2f} m", (20, 50), 
-                    cv2.FONT_HERSHEY_SIMPLEX, 1, (0, 255, 0), 2)
-        cv2.putText(frame, f"Heading: {heading:.2f} deg", (20, 90), 
-                    cv2.FONT_HERSHEY_SIMPLEX, 1, (0, 255, 0), 2)
+        # (green = measured this frame, orange = Kalman prediction)
+        if result["source"] is None:
+            cv2.putText(frame, "No lanes yet", (20, 50),
+                        cv2.FONT_HERSHEY_SIMPLEX, 1, (0, 0, 255), 2)
+        else:
+            color = (0, 255, 0) if result["source"] == "measured" else (0, 165, 255)
+            cv2.putText(frame, f"Offset: {offset:.2f} m ({result['source']})", (20, 50), 
+                        cv2.FONT_HERSHEY_SIMPLEX, 1, color, 2)
+            cv2.putText(frame, f"Heading: {heading:.2f} deg", (20, 90), 
+                        cv2.FONT_HERSHEY_SIMPLEX, 1, color, 2)
+        detector.instruments.draw_hud(frame)
+
+        if BLACKBOX_ENABLED:
+            if blackbox is None:
+                blackbox = BlackBoxRecorder(BLACKBOX_FILE, (frame.shape[1], frame.shape[0]), fps=30,
+                                            clip_stem="lane_departure")
+            blackbox.write(frame, time.time())
+            if result["source"] == "measured" and abs(offset) > LANE_DEPARTURE_M:
+                blackbox.trigger("lane departure")
 
         # 6. Show the Windows
         cv2.imshow('Driver View', frame)       # What the driver sees
-        cv2.imshow('Computer View', warped_view) # What the computer sees (Bird's Eye)
+        if result["warped"] is not None:
+            cv2.imshow('Computer View', result["warped"]) # What the computer sees (Bird's Eye)
 
         # 7. Quit logic
         if cv2.waitKey(1) & 0xFF == ord('q'):
             break
 
+    runtime.stop()
+    print(f"Runtime stats: {runtime.stats()}")
+    if blackbox is not None:
+        blackbox.release()
+        print(f"Black box stats: {blackbox.stats()}")
+    if detector.instruments.enabled:
+        detector.instruments.write_jsonl("lane_stats.jsonl")
+
     cap.release()
     cv2.destroyAllWindows()
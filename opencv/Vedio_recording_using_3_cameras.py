@@ -1,12 +1,34 @@
 import cv2
-import numpy as np
 import time
 
+from world_map import WorldMapCompositor, THREE_CAM_LAYOUT
+from async_writer import AsyncVideoWriter
+from blackbox import BlackBoxRecorder
+from replay_camera import ReplayCamera
+
 # --- CONFIGURATION ---
 CAM_W, CAM_H = 320, 240
 MAP_W, MAP_H = 1000, 600
-OUTPUT_FILE = "multi_cam_recording.avi"  # Name of the output file
+OUTPUT_FILE = "multi_cam_recording.avi"  # Name of the output file (segments get _000, _001, ...)
 RECORDING_FPS = 20.0                     # Frame rate for the video file
+WRITER_QUEUE = 32                        # Frames the encoder may fall behind by
+WRITER_POLICY = "drop"                   # When it falls further: "block", "drop" or "degrade"
+SEGMENT_SECONDS = 10 * 60                # Start a new file every 10 minutes
+# Real capture times go into a .fidx sidecar next to each segment; replay
+# with `python frame_index.py multi_cam_recording_000.avi` for the true rate
+
+# "continuous" encodes every frame; "blackbox" only keeps the last seconds
+# in a ring file and saves a clip around each trigger (press 't')
+RECORD_MODE = "continuous"
+BLACKBOX_FILE = "blackbox.ring"
+BLACKBOX_PRE_SECONDS = 10.0              # Saved from before the trigger...
+BLACKBOX_POST_SECONDS = 5.0              # ...and after it
+
+# Camera index -> replay source (video file or "synthetic"), used by open_camera
+# instead of real hardware, e.g. {1: "1_readimg_photos/Videos/dog.mp4", 2: "synthetic"}
+REPLAY_SOURCES = {}
+REPLAY_FPS = 30.0
+REPLAY_JITTER = 0.002   # Seconds (std dev) of random delay per frame
 
 def open_camera(index):
     """
@@ -17,7 +39,11 @@ def open_camera(index):
     
     # 1. Use DirectShow (Windows) - often faster for USB cams
     # If on Linux/Mac, you might remove cv2.CAP_DSHOW or use cv2.CAP_V4L2
-    cap = cv2.VideoCapture(index, cv2.CAP_DSHOW)
+    if index in REPLAY_SOURCES:
+        # No hardware needed: replay a file or synthetic road frames instead
+        cap = ReplayCamera(REPLAY_SOURCES[index], fps=REPLAY_FPS, jitter=REPLAY_JITTER)
+    else:
+        cap = cv2.VideoCapture(index, cv2.CAP_DSHOW)
     
     if cap.isOpened():
         # --- THE FIX: FORCE MJPG COMPRESSION ---
@@ -54,66 +80,67 @@ def main():
     # We use XVID codec for .avi files (widely supported)
     fourcc_out = cv2.VideoWriter_fourcc(*'XVID')
     # Note: Resolution must match the 'world_map' size exactly: (MAP_W, MAP_H)
-    out = cv2.VideoWriter(OUTPUT_FILE, fourcc_out, RECORDING_FPS, (MAP_W, MAP_H))
-    print(f"Recording started: saving to {OUTPUT_FILE}")
+    if RECORD_MODE == "blackbox":
+        # Steady state is one memcpy per frame; clips are encoded in the background
+        out = None
+        blackbox = BlackBoxRecorder(BLACKBOX_FILE, (MAP_W, MAP_H), RECORDING_FPS,
+                                    BLACKBOX_PRE_SECONDS, BLACKBOX_POST_SECONDS, fourcc=fourcc_out)
+        print(f"Black box armed: {blackbox.ring.slots} frames in {BLACKBOX_FILE}, press 't' to save a clip")
+    else:
+        # Encoding happens on a background thread, so a slow encode doesn't hold up the loop
+        blackbox = None
+        out = AsyncVideoWriter(OUTPUT_FILE, fourcc_out, RECORDING_FPS, (MAP_W, MAP_H),
+                               queue_size=WRITER_QUEUE, policy=WRITER_POLICY,
+                               segment_seconds=SEGMENT_SECONDS, index_cameras=3)
+        print(f"Recording started: saving to {OUTPUT_FILE}")
+
+    compositor = WorldMapCompositor(THREE_CAM_LAYOUT, (MAP_W, MAP_H), (CAM_W, CAM_H))
 
     print("Starting Main Loop...")
 
     while True:
-        # Create Black Canvas (The "World Map")
-        world_map = np.zeros((MAP_H, MAP_W, 3), dtype=np.uint8)
-
-        # --- PROCESS LEFT CAMERA (Index 1) ---
-        if cap_left and cap_left.isOpened():
-            ret, frame = cap_left.read()
-            if ret:
-                # Safety resize: Some cheap cameras ignore cap.set commands
-                frame = cv2.resize(frame, (CAM_W, CAM_H))
-                # Place in left slot
-                world_map[100:100+CAM_H, 0:CAM_W] = frame
-                cv2.putText(world_map, "CAM 1 (Left)", (10, 50), cv2.FONT_HERSHEY_SIMPLEX, 1, (0, 255, 0), 2)
-            else:
-                cv2.putText(world_map, "SIGNAL LOST", (50, 200), cv2.FONT_HERSHEY_SIMPLEX, 1, (0, 0, 255), 2)
-
-        # --- PROCESS CENTER CAMERA (Index 2) ---
-        if cap_center and cap_center.isOpened():
-            ret, frame = cap_center.read()
-            if ret:
-                frame = cv2.resize(frame, (CAM_W, CAM_H))
-                # Place in center slot
-                world_map[100:100+CAM_H, 340:340+CAM_W] = frame
-                cv2.putText(world_map, "CAM 2 (Center)", (350, 50), cv2.FONT_HERSHEY_SIMPLEX, 1, (0, 255, 0), 2)
-            else:
-                cv2.putText(world_map, "SIGNAL LOST", (390, 200), cv2.FONT_HERSHEY_SIMPLEX, 1, (0, 0, 255), 2)
-
-        # --- PROCESS RIGHT CAMERA (Index 3) ---
-        if cap_right and cap_right.isOpened():
-            ret, frame = cap_right.read()
-            if ret:
-                frame = cv2.resize(frame, (CAM_W, CAM_H))
-                # Place in right slot
-                world_map[100:100+CAM_H, 680:680+CAM_W] = frame
-                cv2.putText(world_map, "CAM 3 (Right)", (690, 50), cv2.FONT_HERSHEY_SIMPLEX, 1, (0, 255, 0), 2)
-            else:
-                cv2.putText(world_map, "SIGNAL LOST", (730, 200), cv2.FONT_HERSHEY_SIMPLEX, 1, (0, 0, 255), 2)
+        t_capture = time.time()
+        frames = []
+        cam_ts = []
+        for cap in (cap_left, cap_center, cap_right):
+            ret, frame = cap.read() if cap and cap.isOpened() else (False, None)
+            frames.append(frame if ret else None)
+            cam_ts.append(time.time() if ret else None)
+
+        # Build the "World Map": frames are resized straight into the
+        # preallocated canvas, None shows SIGNAL LOST for that slot
+        world_map = compositor.compose(
+            frames,
+            active=[bool(cap and cap.isOpened()) for cap in (cap_left, cap_center, cap_right)])
 
         # Show the composite image
         cv2.imshow("Navya's Multi-Cam System", world_map)
 
-        # Write the combined frame to the video file
-        out.write(world_map)
+        # Queue the combined frame for the encoder (copied, so world_map can be reused)
+        if blackbox:
+            blackbox.write(world_map, t_capture)
+        else:
+            out.write(world_map, t_capture, cam_ts, [f is not None for f in frames])
 
-        # Quit on 'q'
-        if cv2.waitKey(1) & 0xFF == ord('q'):
+        # Quit on 'q', save a black box clip on 't'
+        key = cv2.waitKey(1) & 0xFF
+        if key == ord('q'):
             break
+        if key == ord('t') and blackbox:
+            blackbox.trigger("key")
 
     # Cleanup
     if cap_left: cap_left.release()
     if cap_center: cap_center.release()
     if cap_right: cap_right.release()
     
-    out.release() # Important: Finalize the video file
-    print("Video saved successfully.")
+    if blackbox:
+        blackbox.release() # Finishes any clip still being saved
+        print(f"Black box stats: {blackbox.stats()}")
+    else:
+        out.release() # Important: Finish the queued frames and finalize the video file
+        print(f"Video saved successfully: {', '.join(out.segments)}")
+        print(f"Writer stats: {out.stats()}")
     
     cv2.destroyAllWindows()
 
@@ -0,0 +1,180 @@
+import os
+import queue
+import threading
+import time
+from collections import deque
+
+import cv2
+import numpy as np
+
+from frame_index import FrameIndexWriter, index_path
+
+
+class AsyncVideoWriter:
+    """
+    cv2.VideoWriter that encodes on a background thread.
+
+    write() only copies the frame into a preallocated buffer and queues it,
+    so a slow encode no longer stalls capture and display. When the queue
+    is full, policy decides what happens:
+
+    'block'   - write() waits for the encoder (nothing is lost)
+    'drop'    - the new frame is dropped and counted
+    'degrade' - frames are thinned out (every 2nd, 3rd, ... frame is kept)
+                while the encoder is behind, and back to every frame once
+                it catches up
+
+    Output is split into segments, path_000.avi, path_001.avi, ..., rotated
+    after segment_seconds of wall-clock time or segment_bytes on disk
+    (either can be None to disable it).
+
+    With index_cameras set, every segment also gets a frame_index sidecar
+    (path_000.fidx, ...) holding one record per frame actually encoded -
+    dropped and skipped frames leave no gap - with the timestamps and
+    camera validity passed to write().
+    """
+    def __init__(self, path, fourcc, fps, size, queue_size=32, policy="block",
+                 segment_seconds=None, segment_bytes=None, index_cameras=None):
+        if policy not in ("block", "drop", "degrade"):
+            raise ValueError(f"Unknown overflow policy: {policy}")
+
+        self.stem, self.ext = os.path.splitext(path)
+        self.fourcc = fourcc
+        self.fps = fps
+        self.size = size
+        self.policy = policy
+        self.segment_seconds = segment_seconds
+        self.segment_bytes = segment_bytes
+        self.index_cameras = index_cameras
+
+        # Counters
+        self.written = 0
+        self.dropped = 0
+        self.skipped = 0      # Frames thinned out by 'degrade'
+        self.segments = []    # Files written so far
+        self.encode_times = deque(maxlen=300)
+
+        # Frames travel as buffer indices: free -> queued -> encoded -> free
+        w, h = size
+        self._buffers = [np.empty((h, w, 3), dtype=np.uint8) for _ in range(queue_size + 1)]
+        self._free = queue.Queue()
+        for i in range(len(self._buffers)):
+            self._free.put(i)
+        # Index metadata travels with its buffer
+        self._meta = [None] * len(self._buffers)
+        # Unbounded, but never holds more than the number of buffers
+        self._queue = queue.Queue()
+        self.queue_size = queue_size
+
+        self._keep_every = 1
+        self._frame_no = 0
+
+        self._writer = None
+        self._index = None
+        self._segment_start = 0.0
+        self._thread = threading.Thread(target=self._encode_loop, name="video-writer", daemon=True)
+        self._thread.start()
+
+    def write(self, frame, t_capture=None, cam_ts=(), valid=()):
+        """
+        Queues a frame. t_capture (time.time() of capture, default now),
+        cam_ts and valid (one entry per camera) go into the sidecar index.
+        """
+        self._frame_no += 1
+        if self.policy == "degrade":
+            self._adapt()
+            if self._frame_no % self._keep_every:
+                self.skipped += 1
+                return
+
+        # 1. Grab a free buffer (the caller may reuse its frame right away)
+        if self.policy == "block":
+            i = self._free.get()
+        else:
+            try:
+                i = self._free.get_nowait()
+            except queue.Empty:
+                self.dropped += 1
+                return
+
+        # 2. Hand it to the encoder
+        np.copyto(self._buffers[i], frame)
+        if self.index_cameras:
+            self._meta[i] = (time.time() if t_capture is None else t_capture, cam_ts, valid)
+        self._queue.put(i)
+
+    def _adapt(self):
+        """
+        'degrade': keep fewer frames while the queue is filling up.
+        """
+        fill = self._queue.qsize() / self.queue_size
+        if fill > 0.75:
+            self._keep_every = min(self._keep_every + 1, 8)
+        elif fill < 0.25 and self._keep_every > 1:
+            self._keep_every -= 1
+
+    def _open_segment(self):
+        path = f"{self.stem}_{len(self.segments):03d}{self.ext}"
+        self._writer = cv2.VideoWriter(path, self.fourcc, self.fps, self.size)
+        if self.index_cameras:
+            self._index = FrameIndexWriter(index_path(path), self.index_cameras)
+        self._segment_start = time.time()
+        self.segments.append(path)
+
+    def _close_segment(self):
+        self._writer.release()
+        if self._index is not None:
+            self._index.close()
+
+    def _should_rotate(self):
+        if self.segment_seconds and time.time() - self._segment_start >= self.segment_seconds:
+            return True
+        # Checking the file size every frame would cost a syscall per frame
+        if self.segment_bytes and self.written % 30 == 0:
+            path = self.segments[-1]
+            return os.path.exists(path) and os.path.getsize(path) >= self.segment_bytes
+        return False
+
+    def _encode_loop(self):
+        while True:
+            i = self._queue.get()
+            if i is None:
+                break
+
+            if self._writer is None or self._should_rotate():
+                if self._writer is not None:
+                    self._close_segment()
+                self._open_segment()
+
+            start = time.perf_counter()
+            self._writer.write(self._buffers[i])
+            self.encode_times.append(time.perf_counter() - start)
+            self.written += 1
+
+            if self._index is not None:
+                t_capture, cam_ts, valid = self._meta[i]
+                self._index.append(t_capture, cam_ts, valid)
+
+            self._free.put(i)
+
+        if self._writer is not None:
+            self._close_segment()
+
+    def stats(self):
+        enc = np.array(self.encode_times) * 1000
+        return {
+            "written": self.written,
+            "dropped": self.dropped,
+            "skipped": self.skipped,
+            "queued": self._queue.qsize(),
+            "segments": len(self.segments),
+            "encode_ms_mean": float(enc.mean()) if len(enc) else 0.0,
+            "encode_ms_p99": float(np.percentile(enc, 99)) if len(enc) else 0.0,
+        }
+
+    def release(self):
+        """
+        Encodes whatever is still queued, then closes the current segment.
+        """
+        self._queue.put(None)
+        self._thread.join()
@@ -0,0 +1,83 @@
+import time
+import numpy as np
+
+from Lane_detection_of_standby_vedio import LaneDetector
+
+
+def find_lane_pixels_masks(detector, binary_warped):
+    """
+    The old sliding window search: four boolean masks over every nonzero
+    pixel per window. Kept here as the reference for LanePixelIndex.
+    """
+    histogram = np.sum(binary_warped[binary_warped.shape[0]//2:, :], axis=0)
+    midpoint = int(histogram.shape[0]//2)
+    leftx_current = np.argmax(histogram[:midpoint])
+    rightx_current = np.argmax(histogram[midpoint:]) + midpoint
+
+    margin = detector.margin
+    window_height = int(binary_warped.shape[0]//detector.nwindows)
+    nonzeroy, nonzerox = binary_warped.nonzero()
+
+    left_lane_inds = []
+    right_lane_inds = []
+
+    for window in range(detector.nwindows):
+        win_y_low = binary_warped.shape[0] - (window+1)*window_height
+        win_y_high = binary_warped.shape[0] - window*window_height
+
+        good_left_inds = ((nonzeroy >= win_y_low) & (nonzeroy < win_y_high) &
+                          (nonzerox >= leftx_current - margin) & (nonzerox < leftx_current + margin)).nonzero()[0]
+        good_right_inds = ((nonzeroy >= win_y_low) & (nonzeroy < win_y_high) &
+                           (nonzerox >= rightx_current - margin) & (nonzerox < rightx_current + margin)).nonzero()[0]
+
+        left_lane_inds.append(good_left_inds)
+        right_lane_inds.append(good_right_inds)
+
+        if len(good_left_inds) > detector.minpix:
+            leftx_current = int(np.mean(nonzerox[good_left_inds]))
+        if len(good_right_inds) > detector.minpix:
+            rightx_current = int(np.mean(nonzerox[good_right_inds]))
+
+    left_lane_inds = np.concatenate(left_lane_inds)
+    right_lane_inds = np.concatenate(right_lane_inds)
+
+    return (nonzerox[left_lane_inds], nonzeroy[left_lane_inds],
+            nonzerox[right_lane_inds], nonzeroy[right_lane_inds])
+
+
+def dense_edges(h, w, density, seed=0):
+    """
+    Random binary 'edge' image with the given fraction of pixels set.
+    """
+    rng = np.random.default_rng(seed)
+    return (rng.random((h, w)) < density).astype(np.uint8) * 255
+
+
+def timeit(fn, *args, repeat=20):
+    fn(*args)  # warm up
+    start = time.perf_counter()
+    for _ in range(repeat):
+        fn(*args)
+    return (time.perf_counter() - start) / repeat * 1000
+
+
+def main():
+    detector = LaneDetector()
+
+    print(f"{'density':>8} {'nonzero':>9} {'masks ms':>9} {'index ms':>9} {'speedup':>8}")
+    for density in (0.01, 0.05, 0.1, 0.25):
+        img = dense_edges(720, 1280, density)
+
+        # Both searches must return exactly the same pixels, in the same order
+        old = find_lane_pixels_masks(detector, img)
+        new = detector.find_lane_pixels(img)
+        for a, b in zip(old, new):
+            assert np.array_equal(a, b), "LanePixelIndex result differs from the mask search"
+
+        t_old = timeit(find_lane_pixels_masks, detector, img)
+        t_new = timeit(detector.find_lane_pixels, img)
+        print(f"{density:>8} {np.count_nonzero(img):>9} {t_old:>9.2f} {t_new:>9.2f} {t_old / t_new:>7.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,205 @@
+import argparse
+import json
+import platform
+import sys
+import time
+
+import cv2
+import numpy as np
+
+from Lane_detection_of_standby_vedio import LaneDetector
+from replay_camera import ReplayCamera
+from world_map import WorldMapCompositor, THREE_CAM_LAYOUT
+
+
+class StageTimer:
+    """
+    Collects per-call latencies for one named stage.
+    """
+    def __init__(self, name):
+        self.name = name
+        self.samples = []
+
+    def time(self, fn, *args):
+        start = time.perf_counter()
+        result = fn(*args)
+        self.samples.append(time.perf_counter() - start)
+        return result
+
+    def summary(self):
+        ms = np.array(self.samples) * 1000
+        return {
+            "n": len(ms),
+            "fps": float(1000 / ms.mean()),
+            "mean_ms": float(ms.mean()),
+            "p50_ms": float(np.percentile(ms, 50)),
+            "p99_ms": float(np.percentile(ms, 99)),
+        }
+
+
+def load_frames(source, n, size):
+    """
+    Decodes n frames up front, so the stage timings don't include decoding.
+    Returns (frames, capture timer).
+    """
+    cam = ReplayCamera(source, fps=None, size=size)
+    if not cam.isOpened():
+        raise IOError(f"Cannot open replay source {source}")
+
+    capture = StageTimer("capture")
+    frames = []
+    for _ in range(n):
+        ret, frame = capture.time(cam.read)
+        if not ret:
+            break
+        frames.append(frame)
+    cam.release()
+    return frames, capture
+
+
+def bench_lane(frames, warmup=5):
+    """
+    Times each LaneDetector stage separately, plus the whole run_pipeline.
+    fit_lane_windows is the sliding window search run_pipeline uses;
+    fit_polynomial includes it again, as in run_pipeline.
+    """
+    detector = LaneDetector()
+    stages = {name: StageTimer(name) for name in
+              ("preprocess", "perspective_transform", "fit_lane_windows", "fit_polynomial", "run_pipeline")}
+
+    for i, frame in enumerate(frames):
+        if i == warmup:
+            for stage in stages.values():
+                stage.samples.clear()
+        edges = stages["preprocess"].time(detector.preprocess, frame)
+        warped, _ = stages["perspective_transform"].time(detector.perspective_transform, edges)
+        stages["fit_lane_windows"].time(detector.fit_lane_windows, warped)
+        stages["fit_polynomial"].time(detector.fit_polynomial, warped)
+        stages["run_pipeline"].time(detector.run_pipeline, frame)
+
+    return stages
+
+
+def bench_lane_batch(frames, cameras=3, warmup=5):
+    """
+    Times run_batch on `cameras` stacked frames against that many run_pipeline
+    calls. Both are reported per tick, so their fps is directly comparable.
+    """
+    detector = LaneDetector()
+    batch = StageTimer(f"run_batch_x{cameras}")
+    serial = StageTimer(f"run_pipeline_x{cameras}")
+
+    def run_serial(stack):
+        for frame in stack:
+            detector.run_pipeline(frame)
+
+    for i in range(len(frames)):
+        if i == warmup:
+            batch.samples.clear()
+            serial.samples.clear()
+        stack = np.stack([frames[(i + k) % len(frames)] for k in range(cameras)])
+        batch.time(detector.run_batch, stack)
+        serial.time(run_serial, stack)
+
+    return {batch.name: batch, serial.name: serial}
+
+
+def bench_color_mask(frames, warmup=5):
+    """
+    Times the yellow/white mask computed directly (cvtColor + inRange)
+    against the compiled lookup table, and checks they agree.
+    """
+    direct = LaneDetector()
+    lut = LaneDetector(color_lut=True)
+    lut.color_mask(frames[0])  # Builds or loads the table outside the timing
+    stages = {"color_mask_hsv": StageTimer("color_mask_hsv"), "color_mask_lut": StageTimer("color_mask_lut")}
+
+    for i, frame in enumerate(frames):
+        if i == warmup:
+            for stage in stages.values():
+                stage.samples.clear()
+        expected = stages["color_mask_hsv"].time(direct.color_mask, frame)
+        got = stages["color_mask_lut"].time(lut.color_mask, frame)
+        if not np.array_equal(expected, got):
+            raise AssertionError(f"LUT mask differs from HSV mask on frame {i}")
+
+    return stages
+
+
+def bench_compositor(frames, cam_size=(320, 240), warmup=5):
+    """
+    Times one world map composition from three camera frames.
+    """
+    compositor = WorldMapCompositor(THREE_CAM_LAYOUT, (1000, 600), cam_size)
+    cam_frames = [cv2.resize(f, cam_size) for f in frames]
+    stage = StageTimer("compositor")
+
+    for i in range(len(cam_frames)):
+        if i == warmup:
+            stage.samples.clear()
+        trio = [cam_frames[i], cam_frames[(i + 1) % len(cam_frames)], cam_frames[(i + 2) % len(cam_frames)]]
+        stage.time(compositor.compose, trio)
+
+    return stage
+
+
+def compare(results, baseline, tolerance):
+    """
+    Stages whose p50 got slower than baseline by more than tolerance (0.2 = 20%).
+    """
+    regressions = []
+    for name, stats in results["stages"].items():
+        old = baseline.get("stages", {}).get(name)
+        if old and stats["p50_ms"] > old["p50_ms"] * (1 + tolerance):
+            regressions.append((name, old["p50_ms"], stats["p50_ms"]))
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Per-stage benchmarks, no cameras needed.")
+    parser.add_argument("--source", default="synthetic", help='"synthetic" or a video file, e.g. 1_readimg_photos/Videos/dog.mp4')
+    parser.add_argument("--frames", type=int, default=200)
+    parser.add_argument("--width", type=int, default=1280)
+    parser.add_argument("--height", type=int, default=720)
+    parser.add_argument("-o", "--out", default="bench_results.json")
+    parser.add_argument("--baseline", help="earlier results JSON to check for regressions")
+    parser.add_argument("--tolerance", type=float, default=0.2)
+    args = parser.parse_args()
+
+    frames, capture = load_frames(args.source, args.frames, (args.width, args.height))
+    stages = {"capture": capture}
+    stages.update(bench_lane(frames))
+    stages.update(bench_lane_batch(frames))
+    stages.update(bench_color_mask(frames))
+    stages["compositor"] = bench_compositor(frames)
+
+    results = {
+        "source": args.source,
+        "frame_size": [args.width, args.height],
+        "frames": len(frames),
+        "python": platform.python_version(),
+        "opencv": cv2.__version__,
+        "machine": platform.machine(),
+        "stages": {name: stage.summary() for name, stage in stages.items()},
+    }
+
+    print(f"{'stage':<24}{'fps':>10}{'p50 ms':>10}{'p99 ms':>10}")
+    for name, s in results["stages"].items():
+        print(f"{name:<24}{s['fps']:>10.1f}{s['p50_ms']:>10.2f}{s['p99_ms']:>10.2f}")
+
+    with open(args.out, "w") as f:
+        json.dump(results, f, indent=2)
+    print(f"\n[System] Results saved to {args.out}")
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+        regressions = compare(results, baseline, args.tolerance)
+        for name, old, new in regressions:
+            print(f"REGRESSION {name}: p50 {old:.2f} ms -> {new:.2f} ms")
+        if regressions:
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,212 @@
+import argparse
+import os
+import threading
+import time
+from collections import deque
+
+import cv2
+import numpy as np
+
+from frame_index import FrameIndexWriter, index_path
+from shm_capture import FrameRing
+
+
+class MmapFrameRing(FrameRing):
+    """
+    FrameRing in a memory-mapped file.
+
+    The page cache absorbs the writes, so adding a frame is a memcpy, and
+    the last frames survive a crash of the recording process: reopening a
+    file of the same shape and slot count keeps its contents (see the
+    export CLI at the bottom). With create=False the file must already
+    exist with exactly that layout.
+    """
+    def __init__(self, path, shape, slots, create=True):
+        size = FrameRing.nbytes(shape, slots)
+        keep = os.path.exists(path) and os.path.getsize(path) == size
+        if not keep and not create:
+            raise ValueError(f"{path} is not a ring of {slots} frames of {shape}")
+        self.path = path
+        self._mm = np.memmap(path, dtype=np.uint8, mode="r+" if keep else "w+", shape=(size,))
+        super().__init__(self._mm, shape, slots, init=not keep)
+
+    def oldest(self):
+        """
+        Seq of the oldest frame still in the ring (0 when empty).
+        """
+        head = self.head()
+        return max(1, head - self.slots + 1) if head else 0
+
+    def find(self, t):
+        """
+        Seq of the first frame with timestamp >= t, or head + 1 if none is.
+        Frames are written in time order, so this is a binary search over seq.
+        """
+        lo, hi = self.oldest() or 1, self.head() + 1
+        while lo < hi:
+            mid = (lo + hi) // 2
+            _, ts = self.frame(mid)
+            if ts < t:
+                lo = mid + 1
+            else:
+                hi = mid
+        return lo
+
+    def close(self):
+        self._release_views()
+        self._mm.flush()
+        del self._mm
+
+
+class _Clip:
+    def __init__(self, start, end, reason):
+        self.start = start    # Window in frame timestamps
+        self.end = end
+        self.reason = reason
+
+
+class BlackBoxRecorder:
+    """
+    Dashcam-style recording: keep the last seconds, save only what matters.
+
+    write() copies each frame into an MmapFrameRing holding a little more
+    than pre_seconds + post_seconds of frames - no encoding in steady state.
+    trigger() (a key, a lane departure, ...) marks an event: a background
+    thread encodes the frames from pre_seconds before it to post_seconds
+    after it into clip_stem_000.avi, ... with a frame_index sidecar for
+    the real timing. It starts at once from the oldest frames, so it stays
+    well ahead of the writer lapping the ring. A trigger while a clip is
+    still open extends that clip instead of starting another.
+    """
+    def __init__(self, path, size, fps, pre_seconds=10.0, post_seconds=5.0,
+                 clip_stem="blackbox_clip", fourcc=None):
+        w, h = size
+        self.size = size
+        self.fps = fps
+        self.pre_seconds = pre_seconds
+        self.post_seconds = post_seconds
+        self.clip_stem = clip_stem
+        self.fourcc = fourcc or cv2.VideoWriter_fourcc(*'XVID')
+
+        # 25% slack on top of the window, for uneven frame rates
+        slots = int(np.ceil((pre_seconds + post_seconds) * fps * 1.25)) + 1
+        self.ring = MmapFrameRing(path, (h, w, 3), slots)
+
+        self.clips = []       # Clip files written so far
+        self.lost = 0         # Clip frames overwritten before they were encoded
+        self.triggers = 0
+
+        self._pending = deque()
+        self._open = None     # Clip being encoded, may still be extended
+        self._cond = threading.Condition()
+        self._running = True
+        self._thread = threading.Thread(target=self._flush_loop, name="blackbox", daemon=True)
+        self._thread.start()
+
+    def write(self, frame, timestamp=None):
+        self.ring.write(frame, time.time() if timestamp is None else timestamp)
+
+    def trigger(self, reason="manual", timestamp=None):
+        """
+        Saves pre_seconds before and post_seconds after timestamp (default now).
+        """
+        t = time.time() if timestamp is None else timestamp
+        with self._cond:
+            self.triggers += 1
+            last = self._pending[-1] if self._pending else self._open
+            if last is not None and t - self.pre_seconds <= last.end:
+                last.end = max(last.end, t + self.post_seconds)
+                if reason not in last.reason:
+                    last.reason += f", {reason}"
+            else:
+                self._pending.append(_Clip(t - self.pre_seconds, t + self.post_seconds, reason))
+            self._cond.notify()
+
+    def _flush_loop(self):
+        while True:
+            with self._cond:
+                self._cond.wait_for(lambda: self._pending or not self._running)
+                if not self._pending:
+                    return
+                self._open = self._pending.popleft()
+            self._encode(self._open)
+            with self._cond:
+                self._open = None
+
+    def _encode(self, clip):
+        path = f"{self.clip_stem}_{len(self.clips):03d}.avi"
+        writer = cv2.VideoWriter(path, self.fourcc, self.fps, self.size)
+        index = FrameIndexWriter(index_path(path), 0)
+        frame_copy = np.empty(self.ring.shape, dtype=np.uint8)
+
+        seq = self.ring.find(clip.start)
+        while True:
+            # 1. Wait for the writer to get to this frame
+            if seq > self.ring.head():
+                if not self._running or time.time() > clip.end + 1.0:
+                    break               # Recording stopped / camera stalled
+                time.sleep(0.5 / self.fps)
+                continue
+
+            # 2. Copy it out, then make sure it wasn't overwritten meanwhile
+            view, ts = self.ring.frame(seq)
+            if view is not None:
+                np.copyto(frame_copy, view)
+            if view is None or not self.ring.still_valid(seq):
+                self.lost += 1
+                seq += 1
+                continue
+            if ts > clip.end:
+                break
+
+            writer.write(frame_copy)
+            index.append(ts)
+            seq += 1
+
+        writer.release()
+        index.close()
+        self.clips.append(path)
+        print(f"[BlackBox] Saved {path} ({index.count} frames, trigger: {clip.reason})")
+
+    def stats(self):
+        return {"triggers": self.triggers, "clips": len(self.clips), "lost": self.lost,
+                "ring_slots": self.ring.slots}
+
+    def release(self):
+        """
+        Finishes the clips still open (with the frames recorded so far) and
+        closes the ring file. The file stays on disk.
+        """
+        with self._cond:
+            self._running = False
+            self._cond.notify()
+        self._thread.join()
+        self.ring.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Save the frames left in a black box ring file as a clip.")
+    parser.add_argument("ring", help="ring file, e.g. blackbox.ring")
+    parser.add_argument("--width", type=int, required=True)
+    parser.add_argument("--height", type=int, required=True)
+    parser.add_argument("--slots", type=int, required=True, help="frames in the ring (printed by the recorder)")
+    parser.add_argument("--fps", type=float, default=20.0)
+    parser.add_argument("-o", "--out", default="blackbox_recovered.avi")
+    args = parser.parse_args()
+
+    ring = MmapFrameRing(args.ring, (args.height, args.width, 3), args.slots, create=False)
+    writer = cv2.VideoWriter(args.out, cv2.VideoWriter_fourcc(*'XVID'), args.fps, (args.width, args.height))
+    index = FrameIndexWriter(index_path(args.out), 0)
+    for seq in range(ring.oldest(), ring.head() + 1):
+        frame, ts = ring.frame(seq)
+        if frame is not None:
+            writer.write(frame)
+            index.append(ts)
+    writer.release()
+    index.close()
+    ring.close()
+    print(f"[BlackBox] Recovered {index.count} frames to {args.out}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,216 @@
+import argparse
+import os
+import struct
+import time
+
+import cv2
+import numpy as np
+
+
+# Sidecar layout: a 16 byte header, then one fixed-size record per frame
+# that made it into the video, in file order.
+INDEX_MAGIC = b"FIDX"
+INDEX_VERSION = 1
+INDEX_EXT = ".fidx"
+_HEADER = struct.Struct("<4sHHI4x")   # magic, version, cameras, record size
+
+
+def record_dtype(cameras):
+    """
+    One index record:
+    frame      - frame number inside the video segment
+    valid      - bit k set if camera k delivered a frame (clear = SIGNAL LOST)
+    t_capture  - wall-clock time (time.time()) the composite was captured
+    cam_ts     - per camera capture time, NaN where the camera had no frame
+
+    There is no byte offset: cv2.VideoWriter buffers its output and doesn't
+    report keyframe positions. Seeking goes by frame number instead
+    (CAP_PROP_POS_FRAMES), which the AVI's own index resolves.
+    """
+    return np.dtype([
+        ("frame", "<u4"),
+        ("valid", "<u4"),
+        ("t_capture", "<f8"),
+        ("cam_ts", "<f8", (cameras,)),
+    ])
+
+
+def index_path(video_path):
+    return os.path.splitext(video_path)[0] + INDEX_EXT
+
+
+class FrameIndexWriter:
+    """
+    Appends index records for one video segment.
+    """
+    def __init__(self, path, cameras):
+        self.path = path
+        self.cameras = cameras
+        self._record = np.zeros(1, dtype=record_dtype(cameras))
+        self._file = open(path, "wb")
+        self._file.write(_HEADER.pack(INDEX_MAGIC, INDEX_VERSION, cameras, self._record.itemsize))
+        self.count = 0
+
+    def append(self, t_capture, cam_ts=(), valid=()):
+        r = self._record[0]
+        r["frame"] = self.count
+        r["valid"] = sum(1 << k for k, ok in enumerate(valid) if ok)
+        r["t_capture"] = t_capture
+        r["cam_ts"] = np.nan
+        r["cam_ts"][:len(cam_ts)] = [np.nan if t is None else t for t in cam_ts]
+        self._file.write(self._record.tobytes())
+        self.count += 1
+
+    def close(self):
+        self._file.close()
+
+
+class FrameIndex:
+    """
+    Read-only, memory-mapped view of a sidecar index.
+
+    Records are sorted by capture time, so finding the frame for a given
+    time is a binary search over the mapped column: O(log n), nothing is
+    read into memory up front. A trailing partial record (recorder killed
+    mid-write) is ignored.
+    """
+    def __init__(self, path):
+        self.path = path
+        with open(path, "rb") as f:
+            magic, version, cameras, size = _HEADER.unpack(f.read(_HEADER.size))
+        if magic != INDEX_MAGIC or version != INDEX_VERSION:
+            raise ValueError(f"{path} is not a version {INDEX_VERSION} frame index")
+
+        self.cameras = cameras
+        dtype = record_dtype(cameras)
+        if dtype.itemsize != size:
+            raise ValueError(f"{path}: record size {size}, expected {dtype.itemsize}")
+
+        count = (os.path.getsize(path) - _HEADER.size) // size
+        if count > 0:
+            self.records = np.memmap(path, dtype=dtype, mode="r", offset=_HEADER.size, shape=(count,))
+        else:
+            self.records = np.zeros(0, dtype=dtype)
+
+    def __len__(self):
+        return len(self.records)
+
+    @property
+    def times(self):
+        return self.records["t_capture"]
+
+    def duration(self):
+        return float(self.times[-1] - self.times[0]) if len(self) > 1 else 0.0
+
+    def fps(self):
+        """
+        Actual average frame rate of the recording.
+        """
+        return (len(self) - 1) / self.duration() if len(self) > 1 else 0.0
+
+    def frame_at(self, t):
+        """
+        Frame on screen at wall-clock time t: the last one captured at or
+        before t (clamped to the first/last frame).
+        """
+        i = int(np.searchsorted(self.times, t, side="right")) - 1
+        return min(max(i, 0), len(self) - 1)
+
+    def frame_after(self, seconds):
+        """
+        Same as frame_at, with the time given relative to the first frame.
+        """
+        return self.frame_at(self.times[0] + seconds)
+
+    def camera_valid(self, camera):
+        """
+        Per frame bool array: did this camera deliver a frame?
+        """
+        return (self.records["valid"] >> camera) & 1 == 1
+
+    def close(self):
+        # The mapping goes away once no array refers to it any more
+        self.records = self.records[:0].copy()
+
+
+class IndexedPlayer:
+    """
+    Plays a recorded segment back at the rate it was captured.
+
+    Frame timing comes from the sidecar index instead of the nominal fps in
+    the AVI header, so playback (and anything that aligns the video with
+    other data by time) doesn't drift when the recording loop ran slower
+    or unevenly. seek() jumps by time without decoding everything before it.
+    """
+    def __init__(self, video_path, index=None):
+        self.cap = cv2.VideoCapture(video_path)
+        if not self.cap.isOpened():
+            raise IOError(f"Cannot open {video_path}")
+        self.index = index or FrameIndex(index_path(video_path))
+        self.pos = 0
+
+        self._clock_start = None    # perf_counter at the first shown frame
+        self._t0 = None             # its capture time
+
+    def seek(self, seconds):
+        """
+        Jumps to the frame shown `seconds` into the recording.
+        """
+        self.pos = self.index.frame_after(seconds)
+        self.cap.set(cv2.CAP_PROP_POS_FRAMES, self.pos)
+        self._clock_start = None
+
+    def read(self, realtime=True):
+        """
+        Next (ret, frame, record). With realtime, waits until the frame is
+        due relative to the first frame read since the last seek.
+        """
+        if self.pos >= len(self.index):
+            return False, None, None
+        ret, frame = self.cap.read()
+        if not ret:
+            return False, None, None
+
+        record = self.index.records[self.pos]
+        self.pos += 1
+
+        if realtime:
+            if self._clock_start is None:
+                self._clock_start, self._t0 = time.perf_counter(), record["t_capture"]
+            delay = (record["t_capture"] - self._t0) - (time.perf_counter() - self._clock_start)
+            if delay > 0:
+                time.sleep(delay)
+        return True, frame, record
+
+    def release(self):
+        self.cap.release()
+        self.index.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Play a recorded segment at its captured frame rate.")
+    parser.add_argument("video", help="segment file, e.g. multi_cam_recording_000.avi")
+    parser.add_argument("--start", type=float, default=0.0, help="seconds into the recording")
+    args = parser.parse_args()
+
+    player = IndexedPlayer(args.video)
+    index = player.index
+    print(f"{len(index)} frames over {index.duration():.1f} s ({index.fps():.1f} fps actual)")
+    for cam in range(index.cameras):
+        print(f"Camera {cam}: signal lost in {np.count_nonzero(~index.camera_valid(cam))} frames")
+
+    player.seek(args.start)
+    while True:
+        ret, frame, _ = player.read()
+        if not ret:
+            break
+        cv2.imshow("Replay", frame)
+        if cv2.waitKey(1) & 0xFF == ord('q'):
+            break
+
+    player.release()
+    cv2.destroyAllWindows()
+
+
+if __name__ == "__main__":
+    main()
@@ -1,11 +1,23 @@
 import cv2
-import numpy as np
 import time
 import platform
+import threading
+
+from world_map import WorldMapCompositor, THREE_CAM_LAYOUT
+from shm_capture import ProcessCamera
+from replay_camera import ReplayCamera
 
 # --- CONFIGURATION ---
 CAM_W, CAM_H = 320, 240
 MAP_W, MAP_H = 1000, 600
+MAX_SKEW = 0.02      # Max time difference (seconds) between frames of one set
+CAPTURE_PROCESSES = False  # True: capture + decode each camera in its own process
+
+# Camera index -> replay source (video file or "synthetic"), used by open_camera
+# instead of real hardware, e.g. {1: "1_readimg_photos/Videos/dog.mp4", 2: "synthetic"}
+REPLAY_SOURCES = {}
+REPLAY_FPS = 30.0
+REPLAY_JITTER = 0.002   # Seconds (std dev) of random delay per frame
 
 def open_camera(index):
     """
@@ -17,7 +29,10 @@ def open_camera(index):
     # 1. Choose Backend based on OS
     # Windows prefers CAP_DSHOW for speed. Linux/Mac prefers default (V4L2/AVFoundation).
     current_os = platform.system()
-    if current_os == 'Windows':
+    if index in REPLAY_SOURCES:
+        # No hardware needed: replay a file or synthetic road frames instead
+        cap = ReplayCamera(REPLAY_SOURCES[index], fps=REPLAY_FPS, jitter=REPLAY_JITTER)
+    elif current_os == 'Windows':
         cap = cv2.VideoCapture(index, cv2.CAP_DSHOW)
     else:
         # Linux/Mac (just use default backend)
@@ -39,61 +54,177 @@ def open_camera(index):
         print(f"❌ Camera {index} failed to open.")
         return None
 
+class CameraGrabber:
+    """
+    Background thread that keeps reading one camera.
+
+    Only the latest frame is kept, together with the time it was grabbed,
+    so a slow consumer never sees a backlog of old frames and never blocks
+    on cap.read() itself.
+    """
+    def __init__(self, cap, name="camera"):
+        self.cap = cap
+        self.name = name
+        self.frame = None
+        self.timestamp = 0.0
+        self.seq = 0           # Increases by one for every new frame
+        self.period = 0.0      # Smoothed time between frames (seconds)
+        self.alive = True      # False once the camera stops delivering
+
+        self._cond = threading.Condition()
+        self._running = True
+        self._thread = threading.Thread(target=self._loop, name=f"grab-{name}", daemon=True)
+        self._thread.start()
+
+    def _loop(self):
+        while self._running:
+            # grab() returns as soon as the frame is captured - timestamp that
+            # instant, and only then pay for the MJPG decode in retrieve()
+            if not self.cap.grab():
+                break
+            timestamp = time.time()
+            ret, frame = self.cap.retrieve()
+            if not ret:
+                break
+            with self._cond:
+                if self.seq:
+                    dt = timestamp - self.timestamp
+                    self.period = dt if self.seq == 1 else 0.9 * self.period + 0.1 * dt
+                self.frame = frame
+                self.timestamp = timestamp
+                self.seq += 1
+                self._cond.notify_all()
+
+        with self._cond:
+            self.alive = False
+            self._cond.notify_all()
+
+    def latest(self):
+        """
+        (frame, timestamp, seq) of the newest frame, frame is None if nothing yet.
+        """
+        with self._cond:
+            return self.frame, self.timestamp, self.seq
+
+    def wait_newer(self, seq, timeout):
+        """
+        Waits until a frame newer than seq arrives (or timeout). Returns latest().
+        """
+        with self._cond:
+            self._cond.wait_for(lambda: self.seq > seq or not self.alive, timeout)
+            return self.frame, self.timestamp, self.seq
+
+    def stop(self):
+        self._running = False
+        self._thread.join(timeout=1.0)
+
+
+class FrameSynchronizer:
+    """
+    Assembles one frame per camera, taken at (nearly) the same instant.
+
+    grabbers may contain None for cameras that failed to open. next() waits
+    for a new frame from the lead (first live) camera, so the main loop runs
+    at camera rate instead of spinning on old frames. Every other camera
+    then contributes the frame closest in time to the lead's frame: if its
+    latest frame is more than max_skew older and its next frame (judging by
+    the camera's frame period) will land closer, we wait for that one, but
+    never past timeout.
+    """
+    def __init__(self, grabbers, max_skew=0.02, timeout=0.1):
+        self.grabbers = grabbers
+        self.max_skew = max_skew
+        self.timeout = timeout
+        self._lead_seq = 0
+
+    def next(self):
+        """
+        Returns (frames, skew): frames[i] is None where a camera has no signal.
+        """
+        live = [g for g in self.grabbers if g is not None and g.alive]
+        deadline = time.perf_counter() + self.timeout
+        latest = {}
+        if not live:
+            return [None] * len(self.grabbers), 0.0
+
+        # 1. Pace the loop on the lead camera
+        lead = live[0]
+        latest[id(lead)] = lead.wait_newer(self._lead_seq, self.timeout)
+        self._lead_seq = latest[id(lead)][2]
+        ref_ts = latest[id(lead)][1]
+
+        # 2. Line the other cameras up with the lead's frame
+        for g in live[1:]:
+            frame, ts, seq = g.latest()
+            while frame is not None and ref_ts - ts > self.max_skew:
+                next_ts = ts + g.period
+                remaining = deadline - time.perf_counter()
+                if abs(next_ts - ref_ts) >= ref_ts - ts or remaining <= 0:
+                    break
+                frame, ts, seq = g.wait_newer(seq, remaining)
+            latest[id(g)] = (frame, ts, seq)
+
+        frames = []
+        stamps = []
+        for g in self.grabbers:
+            entry = latest.get(id(g)) if g is not None else None
+            if entry is None or entry[0] is None:
+                frames.append(None)
+            else:
+                frames.append(entry[0])
+                stamps.append(entry[1])
+
+        skew = max(stamps) - min(stamps) if stamps else 0.0
+        return frames, skew
+
+
 def main():
     print("--- 3-Camera Fusion System (MJPG Mode) ---")
     
-    # Initialize cameras with slight delays to prevent power spikes
-    # NOTE: If you only have 3 cameras total including the webcam, 
-    # your indices might be 0, 1, 2 rather than 1, 2, 3.
-    cap_left = open_camera(1)
-    time.sleep(0.5) 
-    
-    cap_center = open_camera(2)
-    time.sleep(0.5)
-    
-    cap_right = open_camera(3)
-    time.sleep(0.5)
+    if CAPTURE_PROCESSES:
+        # Each camera is opened, read and MJPG-decoded in its own process,
+        # frames come back through shared memory (see shm_capture)
+        cap_left = cap_center = cap_right = None
+        grab_left = ProcessCamera(open_camera, 1, (CAM_H, CAM_W, 3), name="left")
+        time.sleep(0.5)
+        grab_center = ProcessCamera(open_camera, 2, (CAM_H, CAM_W, 3), name="center")
+        time.sleep(0.5)
+        grab_right = ProcessCamera(open_camera, 3, (CAM_H, CAM_W, 3), name="right")
+        time.sleep(0.5)
+    else:
+        # Initialize cameras with slight delays to prevent power spikes
+        # NOTE: If you only have 3 cameras total including the webcam, 
+        # your indices might be 0, 1, 2 rather than 1, 2, 3.
+        cap_left = open_camera(1)
+        time.sleep(0.5) 
+        
+        cap_center = open_camera(2)
+        time.sleep(0.5)
+        
+        cap_right = open_camera(3)
+        time.sleep(0.5)
+
+        # Every camera gets a background grabber, so the three reads happen
+        # in parallel instead of one after another
+        grab_left = CameraGrabber(cap_left, "left") if cap_left else None
+        grab_center = CameraGrabber(cap_center, "center") if cap_center else None
+        grab_right = CameraGrabber(cap_right, "right") if cap_right else None
+
+    sync = FrameSynchronizer([grab_left, grab_center, grab_right], max_skew=MAX_SKEW)
+
+    compositor = WorldMapCompositor(THREE_CAM_LAYOUT, (MAP_W, MAP_H), (CAM_W, CAM_H))
 
     print("Starting Main Loop... Press 'q' to quit.")
 
     while True:
-        # Create Black Canvas (The "World Map")
-        # Initialize fresh every frame to clear old drawings
-        world_map = np.zeros((MAP_H, MAP_W, 3), dtype=np.uint8)
-
-        # --- PROCESS LEFT CAMERA (Index 1) ---
-        if cap_left and cap_left.isOpened():
-            ret, frame = cap_left.read()
-            if ret:
-                # Safety resize: Some cheap cameras ignore cap.set commands
-                frame = cv2.resize(frame, (CAM_W, CAM_H))
-                # Place in left slot
-                world_map[100:100+CAM_H, 0:CAM_W] = frame
-                cv2.putText(world_map, "CAM 1 (Left)", (10, 50), cv2.FONT_HERSHEY_SIMPLEX, 1, (0, 255, 0), 2)
-            else:
-                cv2.putText(world_map, "SIGNAL LOST", (50, 200), cv2.FONT_HERSHEY_SIMPLEX, 1, (0, 0, 255), 2)
-
-        # --- PROCESS CENTER CAMERA (Index 2) ---
-        if cap_center and cap_center.isOpened():
-            ret, frame = cap_center.read()
-            if ret:
-                frame = cv2.resize(frame, (CAM_W, CAM_H))
-                # Place in center slot
-                world_map[100:100+CAM_H, 340:340+CAM_W] = frame
-                cv2.putText(world_map, "CAM 2 (Center)", (350, 50), cv2.FONT_HERSHEY_SIMPLEX, 1, (0, 255, 0), 2)
-            else:
-                cv2.putText(world_map, "SIGNAL LOST", (390, 200), cv2.FONT_HERSHEY_SIMPLEX, 1, (0, 0, 255), 2)
-
-        # --- PROCESS RIGHT CAMERA (Index 3) ---
-        if cap_right and cap_right.isOpened():
-            ret, frame = cap_right.read()
-            if ret:
-                frame = cv2.resize(frame, (CAM_W, CAM_H))
-                # Place in right slot
-                world_map[100:100+CAM_H, 680:680+CAM_W] = frame
-                cv2.putText(world_map, "CAM 3 (Right)", (690, 50), cv2.FONT_HERSHEY_SIMPLEX, 1, (0, 255, 0), 2)
-            else:
-                cv2.putText(world_map, "SIGNAL LOST", (730, 200), cv2.FONT_HERSHEY_SIMPLEX, 1, (0, 0, 255), 2)
+        # One frame per camera, captured within MAX_SKEW of each other
+        (frame_left, frame_center, frame_right), skew = sync.next()
+
+        # Build the "World Map": frames are resized straight into the
+        # preallocated canvas, None shows SIGNAL LOST for that slot
+        world_map = compositor.compose(
+            [frame_left, frame_center, frame_right],
+            active=[grab_left is not None, grab_center is not None, grab_right is not None])
 
         # Show the composite image
         cv2.imshow("Navya's Multi-Cam System", world_map)
@@ -102,7 +233,11 @@ def main():
         if cv2.waitKey(1) & 0xFF == ord('q'):
             break
 
-    # Cleanup
+    # Cleanup - frames from a stopped grabber must not be used any more
+    # (with CAPTURE_PROCESSES they are views into its shared memory)
+    frame_left = frame_center = frame_right = None
+    for grabber in (grab_left, grab_center, grab_right):
+        if grabber: grabber.stop()
     if cap_left: cap_left.release()
     if cap_center: cap_center.release()
     if cap_right: cap_right.release()
@@ -0,0 +1,127 @@
+import argparse
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+import cv2
+import numpy as np
+
+from Lane_detection_of_standby_vedio import LaneDetector
+
+
+def count_frames(video_path):
+    """
+    Number of frames in a video file. Falls back to decoding the whole file
+    when the container doesn't store a frame count.
+    """
+    cap = cv2.VideoCapture(video_path)
+    if not cap.isOpened():
+        raise IOError(f"Cannot open video {video_path}")
+
+    n = int(cap.get(cv2.CAP_PROP_FRAME_COUNT))
+    if n <= 0:
+        n = 0
+        while cap.grab():
+            n += 1
+    cap.release()
+    return n
+
+
+def split_ranges(n_frames, n_chunks):
+    """
+    Splits [0, n_frames) into n_chunks contiguous (start, stop) ranges.
+    """
+    n_chunks = max(1, min(n_chunks, n_frames))
+    bounds = np.linspace(0, n_frames, n_chunks + 1).astype(int)
+    return [(int(a), int(b)) for a, b in zip(bounds[:-1], bounds[1:]) if b > a]
+
+
+def process_range(args):
+    """
+    Worker: runs the lane pipeline over frames [start, stop) of one video.
+    Each worker has its own capture and detector, nothing is shared.
+    """
+    video_path, start, stop, tracking = args
+
+    detector = LaneDetector(tracking=tracking)
+    cap = cv2.VideoCapture(video_path)
+    cap.set(cv2.CAP_PROP_POS_FRAMES, start)
+
+    n = stop - start
+    offsets = np.zeros(n, dtype=np.float32)
+    headings = np.zeros(n, dtype=np.float32)
+    valid = np.zeros(n, dtype=bool)
+    detected = np.zeros(n, dtype=bool)
+
+    for i in range(n):
+        ret, frame = cap.read()
+        if not ret:
+            break
+        offset, heading, _ = detector.run_pipeline(frame)
+        offsets[i] = offset
+        headings[i] = heading
+        valid[i] = True
+        detected[i] = detector.last_fits[0] is not None
+
+    cap.release()
+    return start, offsets, headings, valid, detected
+
+
+def process_video(video_path, workers=None, chunks_per_worker=4, tracking=False, out_path=None):
+    """
+    Runs LaneDetector over a recorded video on a process pool.
+
+    The video is split into contiguous frame ranges (a few per worker, so
+    a slow range doesn't leave the other cores idle), each range is decoded
+    and processed independently, and the results are stitched back in
+    frame order. With tracking=True the tracker restarts at each range.
+
+    Returns a dict of columns: frame, offset (m), heading (deg), valid
+    (False where the frame couldn't be decoded) and detected (False where
+    no lanes were found - offset and heading are 0 there, which is not the
+    same as centered). If out_path is given the columns are also written
+    there as a compressed .npz file.
+    """
+    workers = workers or os.cpu_count() or 1
+    n_frames = count_frames(video_path)
+    ranges = split_ranges(n_frames, workers * chunks_per_worker)
+
+    offsets = np.zeros(n_frames, dtype=np.float32)
+    headings = np.zeros(n_frames, dtype=np.float32)
+    valid = np.zeros(n_frames, dtype=bool)
+    detected = np.zeros(n_frames, dtype=bool)
+
+    jobs = [(video_path, start, stop, tracking) for start, stop in ranges]
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        # map() yields in submission order, i.e. frame order
+        for start, off, head, ok, found in pool.map(process_range, jobs):
+            stop = start + len(off)
+            offsets[start:stop] = off
+            headings[start:stop] = head
+            valid[start:stop] = ok
+            detected[start:stop] = found
+
+    results = {
+        "frame": np.arange(n_frames, dtype=np.int32),
+        "offset": offsets,
+        "heading": headings,
+        "valid": valid,
+        "detected": detected,
+    }
+
+    if out_path:
+        np.savez_compressed(out_path, **results)
+        print(f"[Batch] {n_frames} frames -> {out_path}")
+
+    return results
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Offline lane detection over a recorded video.")
+    parser.add_argument("video", help="e.g. multi_cam_recording.avi or 1_readimg_photos/Videos/dog.mp4")
+    parser.add_argument("-o", "--out", default=None, help="results file (.npz), default: <video>_lanes.npz")
+    parser.add_argument("-j", "--workers", type=int, default=None, help="processes (default: all cores)")
+    parser.add_argument("--tracking", action="store_true", help="use tracking mode inside each range")
+    args = parser.parse_args()
+
+    out = args.out or os.path.splitext(args.video)[0] + "_lanes.npz"
+    process_video(args.video, workers=args.workers, tracking=args.tracking, out_path=out)
@@ -0,0 +1,112 @@
+import hashlib
+import os
+
+import cv2
+import numpy as np
+
+
+# Compiled tables are kept here, one file per set of thresholds
+DEFAULT_CACHE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), ".lane_lut_cache")
+
+
+def all_colors_bgr():
+    """
+    Every 24-bit BGR color once, as a 4096x4096 image. Pixel i has
+    B = i & 255, G = (i >> 8) & 255, R = i >> 16.
+    """
+    i = np.arange(1 << 24, dtype=np.uint32)
+    img = np.empty((1 << 24, 3), dtype=np.uint8)
+    img[:, 0] = i & 255
+    img[:, 1] = (i >> 8) & 255
+    img[:, 2] = i >> 16
+    return img.reshape(4096, 4096, 3)
+
+
+def hsv_range_mask(img, ranges):
+    """
+    The reference mask: cvtColor to HSV, one inRange per (lower, upper)
+    pair, OR-ed together.
+    """
+    hsv = cv2.cvtColor(img, cv2.COLOR_BGR2HSV)
+    mask = None
+    for lower, upper in ranges:
+        m = cv2.inRange(hsv, np.array(lower), np.array(upper))
+        mask = m if mask is None else cv2.bitwise_or(mask, m)
+    return mask
+
+
+class ColorMaskLUT:
+    """
+    HSV threshold ranges compiled into a lookup table over all 2^24 BGR colors.
+
+    The table is built by running hsv_range_mask() on every color once, so
+    lookups give exactly the same mask as cvtColor + inRange (no
+    quantization). On disk it is a packed bitset (2 MB) named after a hash
+    of the ranges and the OpenCV version, so it is only rebuilt when the
+    thresholds change. In memory it is unpacked to one byte per color
+    (16 MB), which makes a lookup a single gather.
+
+    apply() packs each pixel into a 24-bit index (BGR -> BGRA, viewed as
+    uint32) and gathers from the table: one pass, whatever the number of
+    ranges, instead of a color conversion plus one inRange per range.
+    The gather is random access into 16 MB, so its speed depends on how
+    many distinct colors a frame has. Against OpenCV's vectorized HSV path
+    it is roughly even at 720p; measure with benchmarks.py before turning
+    it on.
+    """
+    def __init__(self, ranges, cache_dir=DEFAULT_CACHE_DIR):
+        self.ranges = tuple((tuple(lo), tuple(hi)) for lo, hi in ranges)
+        self.path = os.path.join(cache_dir, f"mask_{self.key()}.npy")
+
+        bits = self._load()
+        if bits is None:
+            bits = self.build()
+            self._save(bits)
+        self.table = np.unpackbits(bits, bitorder="little") * np.uint8(255)
+
+        self._bgra = {}
+
+    def key(self):
+        text = repr((self.ranges, cv2.__version__))
+        return hashlib.sha1(text.encode()).hexdigest()[:16]
+
+    def build(self):
+        """
+        Runs the reference mask over every color. Takes a few tenths of a second.
+        """
+        mask = hsv_range_mask(all_colors_bgr(), self.ranges)
+        return np.packbits(mask.reshape(-1) > 0, bitorder="little")
+
+    def _load(self):
+        try:
+            bits = np.load(self.path)
+        except (OSError, ValueError):
+            return None
+        if bits.dtype != np.uint8 or bits.shape != ((1 << 24) // 8,):
+            return None
+        return bits
+
+    def _save(self, bits):
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        # Write then rename, so a half-written file is never loaded
+        tmp = f"{self.path}.{os.getpid()}.tmp"
+        with open(tmp, "wb") as f:
+            np.save(f, bits)
+        os.replace(tmp, self.path)
+
+    def apply(self, img):
+        """
+        Mask (0/255, uint8) of a BGR image of any height/width.
+        """
+        h, w = img.shape[:2]
+        bgra = self._bgra.get((h, w))
+        if bgra is None:
+            bgra = self._bgra[(h, w)] = np.empty((h, w, 4), dtype=np.uint8)
+
+        # 1. B | G << 8 | R << 16 | 255 << 24 on little endian; drop alpha
+        cv2.cvtColor(img, cv2.COLOR_BGR2BGRA, dst=bgra)
+        keys = bgra.view(np.uint32)[..., 0]
+        keys -= np.uint32(0xFF000000)
+
+        # 2. One gather
+        return np.take(self.table, keys)
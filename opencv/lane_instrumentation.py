@@ -0,0 +1,151 @@
+import json
+import time
+
+import cv2
+import numpy as np
+
+
+class RollingHistogram:
+    """
+    The last `window` samples of one quantity, kept in a fixed ring.
+    Adding a sample is one array store; statistics are computed on demand.
+    """
+    def __init__(self, window=600):
+        self.samples = np.zeros(window, dtype=np.float64)
+        self.count = 0
+
+    def add(self, value):
+        self.samples[self.count % len(self.samples)] = value
+        self.count += 1
+
+    def values(self):
+        return self.samples[:min(self.count, len(self.samples))]
+
+    def histogram(self, bins):
+        counts, edges = np.histogram(self.values(), bins=bins)
+        return counts.tolist(), edges.tolist()
+
+    def summary(self):
+        v = self.values()
+        if len(v) == 0:
+            return {"n": 0}
+        p50, p90, p99 = np.percentile(v, [50, 90, 99])
+        return {"n": len(v), "mean": float(v.mean()), "p50": float(p50),
+                "p90": float(p90), "p99": float(p99), "max": float(v.max())}
+
+
+class Instruments:
+    """
+    Stage timers and counters for LaneDetector.run_pipeline.
+
+    Usage inside the pipeline:
+        t = rec.start()
+        ...work...
+        t = rec.lap("preprocess", t)    # records ms since t, returns now
+
+    Times go to rolling histograms in milliseconds, observe() feeds other
+    values (e.g. pixel counts) into rolling histograms, count() bumps event
+    counters (e.g. tracking fallbacks).
+    """
+    enabled = True
+
+    def __init__(self, window=600):
+        self.window = window
+        self.histograms = {}
+        self.counters = {}
+        self.frames = 0
+        self._last_frame_end = None
+
+    def _hist(self, name):
+        hist = self.histograms.get(name)
+        if hist is None:
+            hist = self.histograms[name] = RollingHistogram(self.window)
+        return hist
+
+    def start(self):
+        return time.perf_counter()
+
+    def lap(self, stage, t):
+        now = time.perf_counter()
+        self._hist(stage).add((now - t) * 1000)
+        return now
+
+    def observe(self, name, value):
+        self._hist(name).add(value)
+
+    def count(self, event, n=1):
+        self.counters[event] = self.counters.get(event, 0) + n
+
+    def end_frame(self, t_frame_start):
+        """
+        Records the whole frame's time and the frame-to-frame interval.
+        """
+        now = time.perf_counter()
+        self._hist("total").add((now - t_frame_start) * 1000)
+        if self._last_frame_end is not None:
+            self._hist("interval").add((now - self._last_frame_end) * 1000)
+        self._last_frame_end = now
+        self.frames += 1
+
+    def fps(self):
+        interval = self.histograms.get("interval")
+        if interval is None or interval.count == 0:
+            return 0.0
+        return 1000.0 / interval.values().mean()
+
+    def snapshot(self):
+        return {
+            "time": time.time(),
+            "frames": self.frames,
+            "fps": self.fps(),
+            "histograms": {name: h.summary() for name, h in self.histograms.items()},
+            "counters": dict(self.counters),
+        }
+
+    def write_jsonl(self, path):
+        """
+        Appends the current snapshot as one JSON line.
+        """
+        with open(path, "a") as f:
+            f.write(json.dumps(self.snapshot()) + "\n")
+
+    def draw_hud(self, frame, org=(20, 130)):
+        """
+        FPS / latency overlay, to sit under the Offset/Heading text.
+        """
+        total = self._hist("total").summary()
+        if total["n"] == 0:
+            return
+        x, y = org
+        cv2.putText(frame, f"FPS: {self.fps():.1f}", (x, y),
+                    cv2.FONT_HERSHEY_SIMPLEX, 1, (0, 255, 255), 2)
+        cv2.putText(frame, f"Latency: {total['p50']:.1f} / {total['p99']:.1f} ms (p50/p99)", (x, y + 40),
+                    cv2.FONT_HERSHEY_SIMPLEX, 1, (0, 255, 255), 2)
+
+
+class NullInstruments:
+    """
+    Instrumentation switched off: every hook is an empty call.
+    """
+    enabled = False
+
+    def start(self):
+        return 0.0
+
+    def lap(self, stage, t):
+        return 0.0
+
+    def observe(self, name, value):
+        pass
+
+    def count(self, event, n=1):
+        pass
+
+    def end_frame(self, t_frame_start):
+        pass
+
+    def draw_hud(self, frame, org=(20, 130)):
+        pass
+
+
+NULL_INSTRUMENTS = NullInstruments()
@@ -0,0 +1,164 @@
+import threading
+import time
+from collections import deque
+
+import numpy as np
+
+
+class FrameQueue:
+    """
+    Bounded queue between two pipeline stages.
+
+    policy='drop_oldest': a full queue throws away its oldest item, so the
+                          consumer always gets the freshest frame.
+    policy='block':       the producer waits until there is room.
+    """
+    def __init__(self, maxsize=1, policy="drop_oldest"):
+        if policy not in ("drop_oldest", "block"):
+            raise ValueError(f"Unknown queue policy: {policy}")
+        self.maxsize = maxsize
+        self.policy = policy
+        self.dropped = 0
+        self._items = deque()
+        self._cond = threading.Condition()
+        self._closed = False
+
+    def put(self, item):
+        with self._cond:
+            if self.policy == "block":
+                while len(self._items) >= self.maxsize and not self._closed:
+                    self._cond.wait()
+            elif len(self._items) >= self.maxsize:
+                self._items.popleft()
+                self.dropped += 1
+            self._items.append(item)
+            self._cond.notify_all()
+
+    def get(self, timeout=None):
+        """
+        Next item, or None if the queue was closed or timed out.
+        """
+        with self._cond:
+            if not self._cond.wait_for(lambda: self._items or self._closed, timeout):
+                return None
+            if not self._items:
+                return None
+            item = self._items.popleft()
+            self._cond.notify_all()
+            return item
+
+    def close(self):
+        with self._cond:
+            self._closed = True
+            self._cond.notify_all()
+
+    def depth(self):
+        with self._cond:
+            return len(self._items)
+
+
+class LaneRuntime:
+    """
+    Capture -> detect -> display, with one thread per stage.
+
+    Capture and detection run on background threads, connected by bounded
+    FrameQueues. Display stays on the calling thread (imshow/waitKey must
+    run on the main thread on most platforms) and pulls finished results
+    with results(). With the default drop_oldest policy a slow stage skips
+    stale frames instead of letting them pile up, so latency stays low.
+
+    Each result is a dict: frame, offset, heading, warped, source, t_capture.
+    With a scheduler (lane_scheduler.DeadlineScheduler) detection may be
+    skipped: warped is then None, and source says whether offset/heading
+    were "measured" or "predicted" (None = no estimate yet).
+    """
+    def __init__(self, cap, detector, queue_size=1, policy="drop_oldest", scheduler=None,
+                 result_queue_size=None):
+        self.cap = cap
+        self.detector = detector
+        self.scheduler = scheduler
+        self.frames = FrameQueue(queue_size, policy)
+        self.done = FrameQueue(result_queue_size or queue_size, policy)
+
+        self.captured = 0
+        self.processed = 0
+        self.latencies = deque(maxlen=300)  # capture -> result, seconds
+
+        self._running = False
+        self._threads = []
+
+    def start(self):
+        self._running = True
+        self._threads = [
+            threading.Thread(target=self._capture_loop, name="capture", daemon=True),
+            threading.Thread(target=self._detect_loop, name="detect", daemon=True),
+        ]
+        for t in self._threads:
+            t.start()
+        return self
+
+    def stop(self):
+        self._running = False
+        self.frames.close()
+        self.done.close()
+        for t in self._threads:
+            t.join(timeout=1.0)
+
+    def _capture_loop(self):
+        while self._running:
+            ret, frame = self.cap.read()
+            if not ret:
+                print("Failed to grab frame")
+                break
+            self.captured += 1
+            self.frames.put((frame, time.perf_counter()))
+        self.frames.close()
+
+    def _detect_loop(self):
+        while self._running:
+            item = self.frames.get()
+            if item is None:
+                break
+            frame, t_capture = item
+            if self.scheduler is not None:
+                result = self.scheduler.process(frame, t_capture)
+                offset, heading, warped = result["offset"], result["heading"], result["warped"]
+                source = result["source"]
+            else:
+                offset, heading, warped = self.detector.run_pipeline(frame)
+                source = "measured" if self.detector.last_fits[0] is not None else None
+            self.processed += 1
+            # warped is the detector's reusable buffer - copy before handing it on
+            self.done.put({
+                "frame": frame,
+                "offset": offset,
+                "heading": heading,
+                "warped": warped.copy() if warped is not None else None,
+                "source": source,
+                "t_capture": t_capture,
+            })
+        self.done.close()
+
+    def results(self):
+        """
+        Yields finished results on the calling thread until capture ends.
+        """
+        while True:
+            result = self.done.get()
+            if result is None:
+                return
+            self.latencies.append(time.perf_counter() - result["t_capture"])
+            yield result
+
+    def stats(self):
+        lat = np.array(self.latencies) * 1000
+        return {
+            "captured": self.captured,
+            "processed": self.processed,
+            "frames_depth": self.frames.depth(),
+            "results_depth": self.done.depth(),
+            "frames_dropped": self.frames.dropped,
+            "results_dropped": self.done.dropped,
+            "latency_ms_mean": float(lat.mean()) if len(lat) else 0.0,
+            "latency_ms_p99": float(np.percentile(lat, 99)) if len(lat) else 0.0,
+        }
@@ -0,0 +1,175 @@
+import time
+
+import numpy as np
+
+
+# Order of the quantities in the filter state
+STATE_NAMES = ("offset", "heading", "left_a", "left_b", "left_c", "right_a", "right_b", "right_c")
+
+# Typical measurement noise (std dev) per quantity: offset in m, heading in
+# degrees, fit coefficients in native pixels for x = Ay^2 + By + C
+DEFAULT_MEAS_STD = (0.05, 1.0, 1e-4, 0.05, 10.0, 1e-4, 0.05, 10.0)
+
+# How fast each quantity's rate of change may drift (std dev per second^2)
+DEFAULT_ACCEL_STD = (0.5, 10.0, 1e-3, 0.5, 100.0, 1e-3, 0.5, 100.0)
+
+
+class LaneKalman:
+    """
+    Constant-velocity Kalman filter over offset, heading and both lane fits.
+
+    Every quantity gets its own [value, rate] state. With independent
+    noise the 16x16 filter splits into eight 2x2 filters, which are run
+    side by side as NumPy arrays.
+    """
+    def __init__(self, meas_std=DEFAULT_MEAS_STD, accel_std=DEFAULT_ACCEL_STD):
+        self.R = np.square(np.asarray(meas_std, dtype=np.float64))
+        self.q = np.square(np.asarray(accel_std, dtype=np.float64))
+        n = len(self.R)
+
+        self.x = np.zeros((n, 2))          # [value, rate] per quantity
+        self.P = np.zeros((n, 2, 2))
+        self.initialized = False
+
+    def reset(self, z):
+        self.x[:, 0] = z
+        self.x[:, 1] = 0.0
+        self.P[:] = 0.0
+        self.P[:, 0, 0] = self.R
+        self.P[:, 1, 1] = self.R * 100     # Rates are unknown at first
+        self.initialized = True
+
+    def predict(self, dt):
+        if not self.initialized or dt <= 0:
+            return
+        # x = F x with F = [[1, dt], [0, 1]]
+        self.x[:, 0] += dt * self.x[:, 1]
+
+        # P = F P F^T + Q (white-noise acceleration)
+        P = self.P
+        p00 = P[:, 0, 0] + dt * (P[:, 1, 0] + P[:, 0, 1]) + dt * dt * P[:, 1, 1]
+        p01 = P[:, 0, 1] + dt * P[:, 1, 1]
+        p10 = P[:, 1, 0] + dt * P[:, 1, 1]
+        P[:, 0, 0] = p00 + self.q * dt ** 3 / 3
+        P[:, 0, 1] = p01 + self.q * dt ** 2 / 2
+        P[:, 1, 0] = p10 + self.q * dt ** 2 / 2
+        P[:, 1, 1] += self.q * dt
+
+    def update(self, z):
+        z = np.asarray(z, dtype=np.float64)
+        if not self.initialized:
+            self.reset(z)
+            return
+
+        # Measurement picks the value: H = [1, 0]
+        P = self.P
+        S = P[:, 0, 0] + self.R
+        K0 = P[:, 0, 0] / S
+        K1 = P[:, 1, 0] / S
+        y = z - self.x[:, 0]
+        self.x[:, 0] += K0 * y
+        self.x[:, 1] += K1 * y
+
+        p00, p01 = P[:, 0, 0].copy(), P[:, 0, 1].copy()
+        P[:, 0, 0] -= K0 * p00
+        P[:, 0, 1] -= K0 * p01
+        P[:, 1, 0] -= K1 * p00
+        P[:, 1, 1] -= K1 * p01
+
+    def value(self, name):
+        return float(self.x[STATE_NAMES.index(name), 0])
+
+    def std(self, name):
+        i = STATE_NAMES.index(name)
+        return float(np.sqrt(self.P[i, 0, 0]))
+
+
+class DeadlineScheduler:
+    """
+    Runs LaneDetector only when it fits the frame's deadline, and fills the
+    other frames in from a LaneKalman.
+
+    Each frame has a deadline of `budget_ms` after its capture timestamp
+    (time.perf_counter() clock). Full detection runs when the expected
+    detection time (smoothed from earlier runs) still fits before that
+    deadline, or - regardless of the deadline - when confidence has dropped:
+    the filter's offset uncertainty is above max_offset_std, or nothing was
+    measured for max_predicted frames in a row.
+
+    process() returns a dict with offset, heading, left_fit, right_fit,
+    warped (None unless detection ran) and source: "measured" when the
+    detector found lanes on this frame - the values are then exactly what it
+    measured, not filtered - "predicted" when the values are a Kalman
+    estimate (frame skipped, or detection failed), or None before the first
+    measurement, when there is nothing to report yet.
+    """
+    def __init__(self, detector, budget_ms=33.0, max_offset_std=0.15, max_predicted=10,
+                 kalman=None):
+        self.detector = detector
+        self.budget_ms = budget_ms
+        self.max_offset_std = max_offset_std
+        self.max_predicted = max_predicted
+        self.kalman = kalman or LaneKalman()
+
+        self.detect_ms = None          # Smoothed detection time
+        self.predicted_in_row = 0
+        self.measured = 0
+        self.predicted = 0
+        self._last_ts = None
+
+    def _must_detect(self):
+        k = self.kalman
+        return (not k.initialized or
+                self.predicted_in_row >= self.max_predicted or
+                k.std("offset") > self.max_offset_std)
+
+    def _fits_deadline(self, timestamp):
+        if self.detect_ms is None:
+            return True
+        remaining_ms = (timestamp - time.perf_counter()) * 1000 + self.budget_ms
+        return self.detect_ms <= remaining_ms
+
+    def process(self, frame, timestamp=None):
+        if timestamp is None:
+            timestamp = time.perf_counter()
+
+        # 1. Move the filter to this frame's time
+        if self._last_ts is not None:
+            self.kalman.predict(timestamp - self._last_ts)
+        self._last_ts = timestamp
+
+        # 2. Detect if there's time for it (or we can't afford not to)
+        warped = None
+        measured = False
+        if self._must_detect() or self._fits_deadline(timestamp):
+            start = time.perf_counter()
+            offset, heading, warped = self.detector.run_pipeline(frame)
+            took = (time.perf_counter() - start) * 1000
+            self.detect_ms = took if self.detect_ms is None else 0.8 * self.detect_ms + 0.2 * took
+
+            left_fit, right_fit = self.detector.native_fits()
+            if left_fit is not None:
+                z = np.concatenate([[offset, heading], left_fit, right_fit])
+                self.kalman.update(z)
+                measured = True
+
+        if measured:
+            self.measured += 1
+            self.predicted_in_row = 0
+        else:
+            self.predicted += 1
+            self.predicted_in_row += 1
+
+        result = {"source": None, "offset": None, "heading": None,
+                  "left_fit": None, "right_fit": None, "warped": warped}
+        if self.kalman.initialized:
+            # Measured frames report the measurement, the rest the estimate
+            x = z if measured else self.kalman.x[:, 0]
+            result.update({
+                "source": "measured" if measured else "predicted",
+                "offset": float(x[0]),
+                "heading": float(x[1]),
+                "left_fit": x[2:5].copy(),
+                "right_fit": x[5:8].copy(),
+            })
+        return result
@@ -1,4 +1,8 @@
-import  datetime
+import atexit
+import os
+
+from ledger import Ledger, money, CREATED, DEPOSIT, WITHDRAWAL, INTEREST, NOTE
+from journal import Journal
 
 class BankAccount:
     def __init__(self, name, initial_balance , pin):
@@ -7,11 +11,62 @@ class BankAccount:
         self.pin = pin
 
 
-        self.trans_hst = []
-        self.log_transaction(f"Account created with ${initial_balance}")
+        #history is kept column-wise (see ledger.py), text is only made when printing
+        self.ledger = Ledger()
+        self._log(CREATED, initial_balance)
+
+        #binary journal the history is saved to, opened on the first save
+        self.journal = None
+
+    @classmethod
+    def restore(cls, name, pin, initial_balance=0, **kwargs):
+        """
+        The account as saved by save_to_file, or a new one with
+        initial_balance if nothing was saved yet.
+        """
+        account = cls(name, initial_balance, pin, **kwargs)
+        journal = Journal(account._journal_stem())
+        balance, ledger = journal.recover()
+        if ledger is not None:
+            account.balance = balance
+            account.ledger = ledger
+        account._open_journal(journal)
+        return account
+
+    def _open_journal(self, journal):
+        #whatever happens, the last saves get fsynced (and checkpointed) on exit
+        self.journal = journal
+        atexit.register(self.close)
+
+    def _journal_stem(self):
+        return f"{self.name}_history"
+
+    @property
+    def trans_hst(self):
+        #old name of the history - rows still read like t['time'], t['event']
+        return self.ledger
 
     def save_to_file(self):
-
+        #appends only what's new since the last save, no matter how long the history is
+        if self.journal is None:
+            journal = Journal(self._journal_stem())
+            if journal.rows:
+                print(f"Error: {journal.path} already holds a history, load it with restore()")
+                return False
+            self._open_journal(journal)
+
+        self.journal.commit(self.ledger)
+        print(f"\n[System] Data saved to {self.journal.path}")
+        return True
+
+    def close(self):
+        #forces the journal to disk - saves on their own only fsync every so often
+        if self.journal is not None:
+            self.journal.close(self.ledger)
+            atexit.unregister(self.close)
+
+    def export_statement(self):
+        #human readable copy of the whole history
         filename = f"{self.name}_history.txt"
 
         with open(filename, 'w') as file:
@@ -19,9 +74,8 @@ class BankAccount:
             file.write(f"Account Balance: ${self.balance}\n")
             file.write("---------------------------------------------------\n")
 
-            for t in self.trans_hst:
-                line = f"[{t['time']}] [{t['event']}] | Bal: ${t['balance_factor']}\n"
-                file.write(line)
+            for t in self.ledger:
+                file.write(f"{t}\n")
 
         print(f"\n[System] Data saved to {filename}")
 
@@ -29,7 +83,7 @@ class BankAccount:
     def deposit(self, amount):
         if amount>0:
             self.balance+= amount
-            self.log_transaction(f"Success! New Balance: ${self.balance}")
+            self._log(DEPOSIT, amount)
 
         else:
             print("Error: Deposit amount is invalid!")
@@ -46,29 +100,38 @@ class BankAccount:
         
 
         self.balance -= amount
-        self.log_transaction(f"Withdrew: ${amount}")
+        self._log(WITHDRAWAL, amount)
         print(f"Success! New Balance is ${self.balance}")
 
 
-    def log_transaction(self, des):
-        timestap = datetime.datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-
-        entry = {
-            "time": timestap,
-            "event": des,
-            "balance_factor": self.balance
-        }
+    def _log(self, kind, amount):
+        self.ledger.append(kind, amount, self.balance)
 
-        self.trans_hst.append(entry)
+    def log_transaction(self, des):
+        #free text entry, the text is stored once however often it's logged
+        self.ledger.append(NOTE, 0.0, self.balance, note=des)
 
     
-    def print_statement(self):
+    def print_statement(self, start=None, end=None, limit=None):
+        #start/end: datetime, "YYYY-MM-DD" or epoch ns - only that range is looked at
+        first, stop = self.ledger.time_range(start, end)
+        if limit is not None:
+            stop = min(stop, first + limit)
 
         print(f"\n---Statement for {self.name}---")
-        for t in self.trans_hst:
-            print(f"[{t['time']}] [{t['event']}] | Bal: ${t['balance_factor']}")
+        if first > 0:
+            print(f"Opening Balance: ${money(self.ledger.balance[first - 1])}")
+        for i in range(first, stop):
+            print(self.ledger[i])
             print("-----------------------------------")
 
+    def statement_page(self, start=None, end=None, cursor=None, limit=50):
+        #(transactions, next_cursor) - pass next_cursor back in for the next page
+        return self.ledger.page(start, end, cursor, limit)
+
+    def balance_as_of(self, when):
+        return self.ledger.balance_as_of(when)
+
 
 
 
@@ -84,7 +147,7 @@ class SavingsAccount(BankAccount):
         interest_amount = self.balance*self.interest_rate
         self.balance += interest_amount
 
-        self.log_transaction(f"Interest Applied! ${interest_amount:.2f}")
+        self._log(INTEREST, interest_amount)
         print(f"Interest added! ${self.balance:.2f}")
 
 
@@ -128,5 +191,16 @@ if __name__ == "__main__":
     # 4. View Statement
     my_savings.print_statement()
 
-    # 5. Save to hard drive
+    # 5. Save to hard drive (journal) and as a readable statement
+    # (the demo starts a new history every run, so drop the last run's one)
+    for ext in (".journal", ".notes", ".ckpt"):
+        if os.path.exists(my_savings._journal_stem() + ext):
+            os.remove(my_savings._journal_stem() + ext)
     my_savings.save_to_file()
+    my_savings.export_statement()
+    my_savings.close()
+
+    # 6. Load it back, as a later run of the program would
+    restored = SavingsAccount.restore("Navya Savings", 5555)
+    print(f"\nRestored: ${restored.balance:.2f} with {len(restored.ledger)} transactions")
+    restored.close()
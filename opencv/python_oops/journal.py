@@ -0,0 +1,212 @@
+import json
+import os
+import time
+
+import numpy as np
+
+from ledger import Ledger, CREATED, DEPOSIT, WITHDRAWAL, INTEREST, TRANSFER_IN, TRANSFER_OUT
+
+
+# One journal record = one ledger row, stored as is
+RECORD = np.dtype([
+    ("time_ns", "<i8"),
+    ("kind", "u1"),
+    ("amount", "<f8"),
+    ("balance", "<f8"),
+    ("note", "<i4"),
+])
+
+
+def balance_change(kind, amount):
+    """
+    What each row did to the balance (vectorized over columns).
+    """
+    sign = np.zeros(len(kind))
+    sign[np.isin(kind, (CREATED, DEPOSIT, INTEREST, TRANSFER_IN))] = 1.0
+    sign[np.isin(kind, (WITHDRAWAL, TRANSFER_OUT))] = -1.0
+    return sign * amount
+
+
+class Journal:
+    """
+    Append-only, binary transaction journal for one account.
+
+    Three files next to each other:
+    <stem>.journal - fixed-size RECORDs, one per ledger row, only ever appended
+    <stem>.notes   - the ledger's interned note texts, one JSON string per line
+    <stem>.ckpt    - one JSON line per checkpoint: rows covered and the balance
+
+    commit() writes only the rows added since the last commit, in a single
+    write, so saving costs O(new rows) instead of rewriting the history.
+    fsync is grouped: at most once per fsync_interval seconds unless forced,
+    so a burst of commits shares one disk flush. Every checkpoint_every rows
+    a checkpoint line is added - only after the rows it covers were synced.
+
+    recover() loads the last checkpoint and replays the journal rows after
+    it to get the balance, and loads the full history back into a Ledger.
+    """
+    def __init__(self, stem, fsync_interval=1.0, checkpoint_every=10000):
+        self.stem = stem
+        self.fsync_interval = fsync_interval
+        self.checkpoint_every = checkpoint_every
+
+        self.rows = self._whole_records()     # Rows on disk
+        self.notes = len(self._read_notes())
+        self.checkpoints = self._read_checkpoints()
+        self.synced_rows = self.rows
+        self._last_sync = time.monotonic()
+
+        # Opened on first commit
+        self._journal = None
+        self._notes = None
+
+    @property
+    def path(self):
+        return self.stem + ".journal"
+
+    def _whole_records(self):
+        """
+        Rows on disk. A torn last record (crash mid-write) is cut off.
+        """
+        if not os.path.exists(self.path):
+            return 0
+        size = os.path.getsize(self.path)
+        rows = size // RECORD.itemsize
+        if rows * RECORD.itemsize != size:
+            with open(self.path, "r+b") as f:
+                f.truncate(rows * RECORD.itemsize)
+        return rows
+
+    def _read_notes(self):
+        """
+        The note texts on disk. A torn last line is cut off.
+        """
+        path = self.stem + ".notes"
+        if not os.path.exists(path):
+            return []
+        notes, good = [], 0
+        with open(path, "rb") as f:
+            for line in f:
+                if not line.endswith(b"\n"):
+                    break
+                try:
+                    notes.append(json.loads(line))
+                except ValueError:
+                    break
+                good += len(line)
+        if good != os.path.getsize(path):
+            with open(path, "r+b") as f:
+                f.truncate(good)
+        return notes
+
+    def _read_checkpoints(self):
+        checkpoints = []
+        if os.path.exists(self.stem + ".ckpt"):
+            with open(self.stem + ".ckpt", encoding="utf-8") as f:
+                for line in f:
+                    try:
+                        checkpoints.append(json.loads(line))
+                    except ValueError:
+                        break    # Torn last line
+        # Never trust a checkpoint past what the journal actually holds
+        return [c for c in checkpoints if c["rows"] <= self.rows]
+
+    def commit(self, ledger, force_sync=False):
+        """
+        Appends the ledger rows (and new notes) not written yet.
+        """
+        if self._journal is None:
+            self._journal = open(self.path, "ab")
+            self._notes = open(self.stem + ".notes", "a", encoding="utf-8")
+
+        # Notes first, so a row never refers to a note that isn't on disk
+        if len(ledger.notes) > self.notes:
+            for text in ledger.notes[self.notes:]:
+                self._notes.write(json.dumps(text) + "\n")
+            self._notes.flush()
+            self.notes = len(ledger.notes)
+
+        new = ledger.count - self.rows
+        if new > 0:
+            start, end = self.rows, ledger.count
+            records = np.empty(new, dtype=RECORD)
+            records["time_ns"] = ledger.time_ns[start:end]
+            records["kind"] = ledger.kind[start:end]
+            records["amount"] = ledger.amount[start:end]
+            records["balance"] = ledger.balance[start:end]
+            records["note"] = ledger.note[start:end]
+            self._journal.write(records.tobytes())
+            self._journal.flush()
+            self.rows = end
+
+        if force_sync or time.monotonic() - self._last_sync >= self.fsync_interval:
+            self.sync(ledger)
+
+    def sync(self, ledger):
+        """
+        fsync everything written so far, then checkpoint if it's due.
+        """
+        if self._journal is None or self.synced_rows == self.rows:
+            return
+        os.fsync(self._notes.fileno())
+        os.fsync(self._journal.fileno())
+        self.synced_rows = self.rows
+        self._last_sync = time.monotonic()
+
+        last = self.checkpoints[-1]["rows"] if self.checkpoints else 0
+        if self.synced_rows - last >= self.checkpoint_every:
+            self.checkpoint(ledger)
+
+    def checkpoint(self, ledger):
+        i = self.synced_rows - 1
+        if i < 0:
+            return
+        entry = {"rows": self.synced_rows, "balance": float(ledger.balance[i]),
+                 "time_ns": int(ledger.time_ns[i])}
+        with open(self.stem + ".ckpt", "a", encoding="utf-8") as f:
+            f.write(json.dumps(entry) + "\n")
+            f.flush()
+            os.fsync(f.fileno())
+        self.checkpoints.append(entry)
+
+    def recover(self):
+        """
+        (balance, ledger) as of the last row on disk, or (None, None) if
+        there is no journal yet.
+        """
+        if self.rows == 0:
+            return None, None
+
+        records = np.fromfile(self.path, dtype=RECORD, count=self.rows)
+        notes = self._read_notes()
+
+        # 1. Balance: last checkpoint + the journal tail replayed on top
+        start, balance = 0, 0.0
+        if self.checkpoints:
+            start, balance = self.checkpoints[-1]["rows"], self.checkpoints[-1]["balance"]
+        tail = records[start:]
+        balance += float(balance_change(tail["kind"], tail["amount"]).sum())
+        if not np.isclose(balance, records["balance"][-1]):
+            print(f"[Journal] Warning: replayed balance {balance} != recorded {records['balance'][-1]}")
+
+        # 2. History
+        ledger = Ledger(capacity=max(16, self.rows))
+        ledger.notes = notes
+        ledger._note_ids = {text: i for i, text in enumerate(notes)}
+        ledger.extend(records["time_ns"], records["kind"], records["amount"],
+                      records["balance"], records["note"])
+        return balance, ledger
+
+    def close(self, ledger=None):
+        if self._journal is None:
+            return
+        if ledger is not None:
+            self.commit(ledger, force_sync=True)
+            # Checkpoint everything on the way out, so the next recover()
+            # doesn't have to replay this session's rows
+            last = self.checkpoints[-1]["rows"] if self.checkpoints else 0
+            if self.synced_rows > last:
+                self.checkpoint(ledger)
+        self._journal.close()
+        self._notes.close()
+        self._journal = self._notes = None
@@ -0,0 +1,213 @@
+import datetime
+import time
+
+import numpy as np
+
+
+# Event types stored in the ledger, and how each one is described.
+# The descriptions are only formatted when a statement is printed.
+CREATED, DEPOSIT, WITHDRAWAL, INTEREST, NOTE, TRANSFER_IN, TRANSFER_OUT = range(7)
+
+
+def money(x):
+    # Whole dollars print as 2000, anything else with cents: 2625.50
+    x = float(x)
+    return str(int(x)) if x.is_integer() else f"{x:.2f}"
+
+
+EVENT_TEMPLATES = {
+    CREATED: lambda amount, balance: f"Account created with ${money(amount)}",
+    DEPOSIT: lambda amount, balance: f"Success! New Balance: ${money(balance)}",
+    WITHDRAWAL: lambda amount, balance: f"Withdrew: ${money(amount)}",
+    INTEREST: lambda amount, balance: f"Interest Applied! ${amount:.2f}",
+    TRANSFER_IN: lambda amount, balance: f"Transfer in: ${money(amount)}",
+    TRANSFER_OUT: lambda amount, balance: f"Transfer out: ${money(amount)}",
+}
+
+
+def format_time(time_ns):
+    return datetime.datetime.fromtimestamp(time_ns / 1e9).strftime("%Y-%m-%d %H:%M:%S")
+
+
+def to_ns(when):
+    """
+    Epoch ns from a datetime, a date, "YYYY-MM-DD[ HH:MM:SS]" or an int (already ns).
+    """
+    if when is None or isinstance(when, (int, np.integer)):
+        return when
+    if isinstance(when, str):
+        when = datetime.datetime.fromisoformat(when)
+    if not isinstance(when, datetime.datetime):
+        when = datetime.datetime.combine(when, datetime.time())
+    return int(when.timestamp() * 1_000_000) * 1000
+
+
+class Transaction:
+    """
+    One ledger row, materialized only when someone asks for it.
+
+    Still readable like the old history dicts: t['time'], t['event'],
+    t['balance_factor'].
+    """
+    __slots__ = ("time_ns", "kind", "amount", "balance", "event")
+
+    def __init__(self, time_ns, kind, amount, balance, event):
+        self.time_ns = time_ns
+        self.kind = kind
+        self.amount = amount
+        self.balance = balance
+        self.event = event
+
+    @property
+    def time(self):
+        return format_time(self.time_ns)
+
+    def __getitem__(self, key):
+        if key == "balance_factor":
+            return self.balance
+        if key in ("time", "event"):
+            return getattr(self, key)
+        raise KeyError(key)
+
+    def __str__(self):
+        return f"[{self.time}] [{self.event}] | Bal: ${money(self.balance)}"
+
+
+class Ledger:
+    """
+    Transaction history stored column by column.
+
+    Each row is a timestamp (epoch ns), an event type, the amount and the
+    balance after it, in NumPy arrays that double their capacity when
+    full - about 29 bytes a row, against a dict plus a formatted string per
+    row before. Free text notes are interned: every distinct text is kept
+    once and rows refer to it by number.
+
+    Timestamps never go backwards (a row is stamped no earlier than the
+    one before it, even if the clock steps back), so time queries are
+    binary searches on time_ns. Since every row also stores the balance
+    after it, each row doubles as a balance checkpoint: balance_as_of() is
+    one search, however long the history.
+    """
+    COLUMNS = ("time_ns", "kind", "amount", "balance", "note")
+
+    def __init__(self, capacity=16):
+        self.count = 0
+        self.time_ns = np.empty(capacity, dtype=np.int64)
+        self.kind = np.empty(capacity, dtype=np.uint8)
+        self.amount = np.empty(capacity, dtype=np.float64)
+        self.balance = np.empty(capacity, dtype=np.float64)
+        self.note = np.empty(capacity, dtype=np.int32)   # -1 = no note
+
+        self.notes = []          # Interned texts
+        self._note_ids = {}
+
+    def _grow(self, needed):
+        capacity = len(self.time_ns)
+        while capacity < needed:
+            capacity *= 2
+        for name in self.COLUMNS:
+            old = getattr(self, name)
+            new = np.empty(capacity, dtype=old.dtype)
+            new[:self.count] = old[:self.count]
+            setattr(self, name, new)
+
+    def intern(self, text):
+        note = self._note_ids.get(text)
+        if note is None:
+            note = self._note_ids[text] = len(self.notes)
+            self.notes.append(text)
+        return note
+
+    def append(self, kind, amount, balance, note=None, time_ns=None):
+        i = self.count
+        if i == len(self.time_ns):
+            self._grow(i + 1)
+        t = time.time_ns() if time_ns is None else time_ns
+        self.time_ns[i] = t if i == 0 else max(t, self.time_ns[i - 1])
+        self.kind[i] = kind
+        self.amount[i] = amount
+        self.balance[i] = balance
+        self.note[i] = -1 if note is None else self.intern(note)
+        self.count = i + 1
+
+    def extend(self, time_ns, kind, amount, balance, note):
+        """
+        Appends whole columns at once (note ids must already be interned).
+        time_ns, kind and note may also be single values for every row.
+        """
+        n = len(amount)
+        if self.count + n > len(self.time_ns):
+            self._grow(self.count + n)
+        end = self.count + n
+        self.time_ns[self.count:end] = time_ns
+        # Keep the column sorted for the time queries
+        times = self.time_ns[max(self.count - 1, 0):end]
+        if np.any(times[1:] < times[:-1]):
+            np.maximum.accumulate(times, out=times)
+        self.kind[self.count:end] = kind
+        self.amount[self.count:end] = amount
+        self.balance[self.count:end] = balance
+        self.note[self.count:end] = note
+        self.count = end
+
+    def describe(self, i):
+        note = self.note[i]
+        if note >= 0:
+            return self.notes[note]
+        return EVENT_TEMPLATES[self.kind[i]](float(self.amount[i]), float(self.balance[i]))
+
+    def search(self, when, side="left"):
+        """
+        Row number where `when` would be inserted (O(log n)).
+        """
+        return int(np.searchsorted(self.time_ns[:self.count], to_ns(when), side=side))
+
+    def time_range(self, start=None, end=None):
+        """
+        (first, stop) rows of the transactions with start <= time < end.
+        """
+        first = 0 if start is None else self.search(start)
+        stop = self.count if end is None else self.search(end)
+        return first, max(first, stop)
+
+    def balance_as_of(self, when):
+        """
+        Balance right after the last transaction at or before `when`,
+        None if the account didn't exist yet.
+        """
+        i = self.search(when, side="right")
+        return float(self.balance[i - 1]) if i else None
+
+    def page(self, start=None, end=None, cursor=None, limit=50):
+        """
+        One page of the transactions in [start, end): (transactions, next_cursor).
+
+        The cursor is the row to continue from - rows are never removed or
+        reordered, so it stays valid while new transactions come in.
+        next_cursor is None on the last page.
+        """
+        first, stop = self.time_range(start, end)
+        if cursor is not None:
+            first = max(first, cursor)
+        last = min(stop, first + limit)
+        rows = [self[i] for i in range(first, last)]
+        return rows, (last if last < stop else None)
+
+    def nbytes(self):
+        return sum(getattr(self, name).nbytes for name in self.COLUMNS)
+
+    def __len__(self):
+        return self.count
+
+    def __getitem__(self, i):
+        if i < 0:
+            i += self.count
+        if not 0 <= i < self.count:
+            raise IndexError("ledger index out of range")
+        return Transaction(int(self.time_ns[i]), int(self.kind[i]), float(self.amount[i]),
+                           float(self.balance[i]), self.describe(i))
+
+    def __iter__(self):
+        for i in range(self.count):
+            yield self[i]
@@ -0,0 +1,126 @@
+import itertools
+import threading
+
+from ledger import DEPOSIT, WITHDRAWAL, TRANSFER_IN, TRANSFER_OUT
+
+
+class AccountRegistry:
+    """
+    Accounts by id, safe to use from many threads at once.
+
+    Every account id maps to one of `stripes` locks, and each operation
+    only holds the locks of the accounts it touches - updates to unrelated
+    accounts don't wait for each other, without a lock per account.
+
+    transfer_batch() is all or nothing: it takes every stripe the batch
+    needs, always in ascending order (so two batches can't deadlock
+    waiting for each other), checks the whole batch against the balances
+    it would produce, and only then applies it. If any transfer would fail
+    nothing is changed.
+    """
+    def __init__(self, stripes=64):
+        self._accounts = {}
+        self._locks = [threading.Lock() for _ in range(stripes)]
+        self._ids = itertools.count(1)
+        self._add_lock = threading.Lock()
+
+    def add(self, account, account_id=None):
+        with self._add_lock:
+            if account_id is None:
+                account_id = next(self._ids)
+            if account_id in self._accounts:
+                raise ValueError(f"Account id {account_id} is already taken")
+            self._accounts[account_id] = account
+        return account_id
+
+    def get(self, account_id):
+        return self._accounts[account_id]
+
+    def __len__(self):
+        return len(self._accounts)
+
+    def _stripe(self, account_id):
+        return hash(account_id) % len(self._locks)
+
+    def _locked(self, account_ids):
+        """
+        Context manager holding the stripes of all these accounts.
+        """
+        return _StripeLocks([self._locks[s] for s in sorted({self._stripe(a) for a in account_ids})])
+
+    def deposit(self, account_id, amount):
+        if amount <= 0:
+            return False
+        account = self._accounts[account_id]
+        with self._locks[self._stripe(account_id)]:
+            account.balance += amount
+            account.ledger.append(DEPOSIT, amount, account.balance)
+        return True
+
+    def withdraw(self, account_id, amount, pin):
+        account = self._accounts[account_id]
+        with self._locks[self._stripe(account_id)]:
+            if not _allowed(account, amount, pin, account.balance):
+                return False
+            account.balance -= amount
+            account.ledger.append(WITHDRAWAL, amount, account.balance)
+        return True
+
+    def transfer(self, src, dst, amount, pin):
+        return self.transfer_batch([(src, dst, amount, pin)])
+
+    def transfer_batch(self, transfers):
+        """
+        transfers: [(src id, dst id, amount, src pin), ...], applied in order.
+        True if the whole batch went through, False if nothing did.
+        """
+        ids = set()
+        for src, dst, _, _ in transfers:
+            if src not in self._accounts or dst not in self._accounts:
+                return False
+            ids.update((src, dst))
+
+        with self._locked(ids):
+            # 1. Validate against the balances the batch would produce
+            balances = {a: self._accounts[a].balance for a in ids}
+            for src, dst, amount, pin in transfers:
+                if src == dst or not _allowed(self._accounts[src], amount, pin, balances[src]):
+                    return False
+                balances[src] -= amount
+                balances[dst] += amount
+
+            # 2. Apply - can't fail any more
+            for src, dst, amount, _ in transfers:
+                source, target = self._accounts[src], self._accounts[dst]
+                source.balance -= amount
+                source.ledger.append(TRANSFER_OUT, amount, source.balance)
+                target.balance += amount
+                target.ledger.append(TRANSFER_IN, amount, target.balance)
+        return True
+
+    def total_balance(self):
+        """
+        Sum over all accounts, taken with every stripe held (a consistent snapshot).
+        """
+        with _StripeLocks(self._locks):
+            return sum(account.balance for account in self._accounts.values())
+
+
+def _allowed(account, amount, pin, balance):
+    # Same rules as withdraw(): right pin, and the balance may not drop
+    # below zero (or a savings account's min_balance)
+    return (amount > 0 and account.pin == pin and
+            balance - amount >= getattr(account, "min_balance", 0))
+
+
+class _StripeLocks:
+    def __init__(self, locks):
+        self.locks = locks
+
+    def __enter__(self):
+        for lock in self.locks:
+            lock.acquire()
+
+    def __exit__(self, *exc):
+        for lock in reversed(self.locks):
+            lock.release()
@@ -0,0 +1,120 @@
+import random
+import time
+
+import cv2
+import numpy as np
+
+
+def synthetic_road(w=1280, h=720, t=0.0):
+    """
+    Draws a simple road frame: grey asphalt, a yellow left line and a white
+    right line inside the LaneDetector trapezoid. The lanes sway and curve
+    slowly with t (seconds), so tracking and smoothing have work to do.
+    """
+    img = np.full((h, w, 3), 60, dtype=np.uint8)
+    shift = 0.02 * np.sin(t * 0.7)
+    curve = 0.04 * np.sin(t * 0.3)
+
+    ys = np.arange(int(h * 0.65), h, 4)
+    k = (ys - h * 0.65) / (h * 0.35)  # 0 at the horizon, 1 at the bottom
+    for side, color in ((-1, (0, 220, 255)), (1, (255, 255, 255))):
+        xs = w / 2 + shift * w + side * (0.05 * w + 0.35 * w * k) + curve * w * (1 - k) ** 2
+        pts = np.stack([xs, ys], axis=1).astype(np.int32)
+        cv2.polylines(img, [pts], False, color, max(2, w // 160))
+    return img
+
+
+class ReplayCamera:
+    """
+    Stand-in for cv2.VideoCapture that needs no hardware.
+
+    source is a video file (e.g. 1_readimg_photos/Videos/dog.mp4, looped)
+    or "synthetic" for synthetic_road() frames. Frames are handed out at
+    fps in real time, each delayed by a random jitter (seconds, std dev);
+    fps=None replays as fast as possible. Frames are resized to whatever
+    CAP_PROP_FRAME_WIDTH / HEIGHT was set to, like a real camera would.
+    """
+    def __init__(self, source, fps=30.0, jitter=0.0, loop=True, size=None, seed=None):
+        self.source = source
+        self.fps = fps
+        self.jitter = jitter
+        self.loop = loop
+        self.size = size            # (w, h), None keeps the source size
+        self._rng = random.Random(seed)
+
+        self._cap = None
+        if source != "synthetic":
+            self._cap = cv2.VideoCapture(source)
+        self._opened = source == "synthetic" or self._cap.isOpened()
+
+        self._frame_no = 0
+        self._start = None
+        self._frame = None
+
+    def isOpened(self):
+        return self._opened
+
+    def set(self, prop, value):
+        w, h = self.size or (1280, 720)
+        if prop == cv2.CAP_PROP_FRAME_WIDTH:
+            self.size = (int(value), h)
+        elif prop == cv2.CAP_PROP_FRAME_HEIGHT:
+            self.size = (w, int(value))
+        return True
+
+    def get(self, prop):
+        if prop == cv2.CAP_PROP_FPS:
+            return self.fps or 0.0
+        if prop == cv2.CAP_PROP_FRAME_WIDTH and self.size:
+            return float(self.size[0])
+        if prop == cv2.CAP_PROP_FRAME_HEIGHT and self.size:
+            return float(self.size[1])
+        return self._cap.get(prop) if self._cap is not None else 0.0
+
+    def _next_frame(self):
+        if self._cap is None:
+            w, h = self.size or (1280, 720)
+            return synthetic_road(w, h, self._frame_no / (self.fps or 30.0))
+
+        ret, frame = self._cap.read()
+        if not ret and self.loop:
+            self._cap.set(cv2.CAP_PROP_POS_FRAMES, 0)
+            ret, frame = self._cap.read()
+        return frame if ret else None
+
+    def grab(self):
+        if not self._opened:
+            return False
+
+        # Wait for this frame's slot on the real-time clock
+        if self.fps:
+            if self._start is None:
+                self._start = time.perf_counter()
+            due = self._start + self._frame_no / self.fps
+            if self.jitter:
+                due += abs(self._rng.gauss(0.0, self.jitter))
+            delay = due - time.perf_counter()
+            if delay > 0:
+                time.sleep(delay)
+
+        self._frame = self._next_frame()
+        self._frame_no += 1
+        return self._frame is not None
+
+    def retrieve(self):
+        frame = self._frame
+        if frame is None:
+            return False, None
+        if self.size and (frame.shape[1], frame.shape[0]) != self.size:
+            frame = cv2.resize(frame, self.size)
+        return True, frame
+
+    def read(self):
+        if not self.grab():
+            return False, None
+        return self.retrieve()
+
+    def release(self):
+        if self._cap is not None:
+            self._cap.release()
+        self._opened = False
@@ -0,0 +1,279 @@
+import multiprocessing as mp
+import threading
+import time
+import weakref
+from multiprocessing import shared_memory
+
+import cv2
+import numpy as np
+
+
+class FrameRing:
+    """
+    Ring of fixed-size frames laid out in a writable buffer.
+
+    Layout: head (int64) | seq[slots] (int64) | ts[slots] (float64) | frames.
+    Frame n (counting from 1) lives in slot (n - 1) % slots. The writer marks
+    the slot invalid (seq 0), copies the frame, stores its timestamp and
+    only then publishes seq and head, so a reader never picks up a half
+    written frame.
+
+    Readers get zero-copy NumPy views into the ring. A view stays intact
+    until the writer comes round to that slot again (slots - 1 frames
+    later) - use still_valid(seq) after working on it, or copy it.
+
+    The buffer can be shared memory (SharedFrameRing) or a memory-mapped
+    file (blackbox.MmapFrameRing).
+    """
+    def __init__(self, buf, shape, slots, init=True):
+        self.shape = tuple(shape)
+        self.slots = slots
+        header = self.header_bytes(slots)
+
+        self._head = np.ndarray((1,), dtype=np.int64, buffer=buf, offset=0)
+        self._seq = np.ndarray((slots,), dtype=np.int64, buffer=buf, offset=8)
+        self._ts = np.ndarray((slots,), dtype=np.float64, buffer=buf, offset=8 + 8 * slots)
+        self._frames = np.ndarray((slots,) + self.shape, dtype=np.uint8, buffer=buf, offset=header)
+
+        if init:
+            self._head[0] = 0
+            self._seq[:] = 0
+
+    @staticmethod
+    def header_bytes(slots):
+        header = 8 * (1 + 2 * slots)
+        return (header + 63) // 64 * 64  # Keep frames cache-line aligned
+
+    @classmethod
+    def nbytes(cls, shape, slots):
+        return cls.header_bytes(slots) + slots * int(np.prod(shape))
+
+    def write(self, frame, timestamp):
+        """
+        Writer side: copies frame (resized if needed) into the next slot.
+        """
+        n = int(self._head[0]) + 1
+        slot = (n - 1) % self.slots
+
+        self._seq[slot] = 0
+        dst = self._frames[slot]
+        if frame.shape == self.shape:
+            np.copyto(dst, frame)
+        else:
+            # Safety resize: some cheap cameras ignore cap.set commands
+            cv2.resize(frame, (self.shape[1], self.shape[0]), dst=dst)
+        self._ts[slot] = timestamp
+        self._seq[slot] = n
+        self._head[0] = n
+
+    def head(self):
+        return int(self._head[0])
+
+    def latest(self):
+        """
+        (frame view, timestamp, seq) of the newest frame - frame is None
+        while nothing has been written yet.
+        """
+        while True:
+            n = int(self._head[0])
+            if n == 0:
+                return None, 0.0, 0
+            slot = (n - 1) % self.slots
+            ts = float(self._ts[slot])
+            if int(self._seq[slot]) == n:
+                return self._export(slot), ts, n
+            # The writer lapped us between reading head and seq - try again
+
+    def still_valid(self, seq):
+        """
+        True while the frame with this seq hasn't been overwritten.
+        """
+        return int(self._seq[(seq - 1) % self.slots]) == seq
+
+    def frame(self, seq):
+        """
+        (frame view, timestamp) of frame seq, or (None, 0.0) if it hasn't
+        been written yet or was already overwritten.
+        """
+        slot = (seq - 1) % self.slots
+        ts = float(self._ts[slot])
+        if seq < 1 or int(self._seq[slot]) != seq:
+            return None, 0.0
+        return self._export(slot), ts
+
+    def _export(self, slot):
+        # Hook for rings that need to know which views are handed out
+        return self._frames[slot]
+
+    def period(self):
+        """
+        Average time between the frames currently in the ring.
+        """
+        n = int(self._head[0])
+        span = min(n, self.slots) - 1
+        if span < 1:
+            return 0.0
+        newest = self._ts[(n - 1) % self.slots]
+        oldest = self._ts[(n - 1 - span) % self.slots]
+        return float(newest - oldest) / span
+
+    def _release_views(self):
+        del self._head, self._seq, self._ts, self._frames
+
+
+class SharedFrameRing(FrameRing):
+    """
+    FrameRing in a multiprocessing.shared_memory block, for handing frames
+    between processes.
+
+    Unmapping the block under a frame view that is still in use would
+    crash the interpreter on the next read of it, so the ring counts the
+    views it hands out: close() only unmaps once every one of them (and
+    anything sliced from them) has been dropped, and otherwise leaves that
+    to the last one.
+    """
+    def __init__(self, shape, slots=4, name=None, create=True):
+        self._views = 0
+        self._views_lock = threading.RLock()
+        self._close_pending = False
+        size = FrameRing.nbytes(shape, slots)
+        if create:
+            self.shm = shared_memory.SharedMemory(name=name, create=True, size=size)
+        else:
+            self.shm = shared_memory.SharedMemory(name=name)
+        self.name = self.shm.name
+        super().__init__(self.shm.buf, shape, slots, init=create)
+
+    def _export(self, slot):
+        # A buffer export of its own on the block: every array sliced from
+        # the frame keeps it alive, and it is finalized only after it has
+        # let go of the block - then the frame is really no longer used
+        size = self._frames[0].nbytes
+        start = self.header_bytes(self.slots) + slot * size
+        view = np.frombuffer(self.shm.buf[start:start + size], dtype=np.uint8)
+        with self._views_lock:
+            self._views += 1
+        weakref.finalize(view.base, self._view_dropped)
+        return view.reshape(self.shape)
+
+    def _view_dropped(self):
+        with self._views_lock:
+            self._views -= 1
+            if self._views == 0 and self._close_pending:
+                self._close_pending = False
+                self._unmap()
+
+    @property
+    def views_in_use(self):
+        return self._views
+
+    def close(self):
+        """
+        Unmaps the block - right away if no frame views are in use (True),
+        else when the last one is dropped (False).
+        """
+        with self._views_lock:
+            if self._views:
+                self._close_pending = True
+                return False
+            self._unmap()
+            return True
+
+    def _unmap(self):
+        # Drop our views first, SharedMemory refuses to close with exports alive
+        self._release_views()
+        self.shm.close()
+
+    def unlink(self):
+        self.shm.unlink()
+
+
+def _capture_process(opener, index, ring_name, shape, slots, stop):
+    """
+    Runs in its own process: opens the camera, decodes (MJPG) and publishes
+    every frame into the shared ring. Decoding here keeps it off the main
+    process' GIL.
+    """
+    cap = opener(index)
+    if cap is None:
+        return
+    ring = SharedFrameRing(shape, slots, name=ring_name, create=False)
+    try:
+        while not stop.is_set():
+            if not cap.grab():
+                break
+            timestamp = time.time()
+            ret, frame = cap.retrieve()
+            if not ret:
+                break
+            ring.write(frame, timestamp)
+    finally:
+        cap.release()
+        ring.close()
+
+
+class ProcessCamera:
+    """
+    One camera captured and decoded in a separate process.
+
+    Has the same reading interface as fusion_system.CameraGrabber (latest,
+    wait_newer, alive, period, stop), so FrameSynchronizer can mix both.
+    Frames are zero-copy views into the shared ring, and can be fed to the
+    compositor or LaneDetector.run_pipeline directly. Views still held at
+    stop() keep the shared memory mapped until they are dropped.
+
+    Timestamps are time.time() so they compare across processes.
+    """
+    def __init__(self, opener, index, shape, slots=4, name=None):
+        self.name = name or f"camera-{index}"
+        self.ring = SharedFrameRing(shape, slots)
+        self._stop = mp.Event()
+        self._process = mp.Process(
+            target=_capture_process,
+            args=(opener, index, self.ring.name, shape, slots, self._stop),
+            name=f"capture-{self.name}",
+            daemon=True)
+        self._process.start()
+        self._last_seq = 0          # Last frame read()
+
+    @property
+    def alive(self):
+        return self._process.is_alive()
+
+    @property
+    def period(self):
+        return self.ring.period()
+
+    def latest(self):
+        return self.ring.latest()
+
+    def wait_newer(self, seq, timeout):
+        """
+        Polls the ring until a frame newer than seq shows up (or timeout).
+        """
+        deadline = time.perf_counter() + timeout
+        while self.ring.head() <= seq and self.alive and time.perf_counter() < deadline:
+            time.sleep(0.0005)
+        return self.ring.latest()
+
+    def read(self):
+        """
+        cv2.VideoCapture-style read(): waits for the next frame. (False, None)
+        when none came - timeout, or the capture process has ended.
+        """
+        frame, _, seq = self.wait_newer(self._last_seq, 1.0)
+        if frame is None or seq <= self._last_seq:
+            return False, None
+        self._last_seq = seq
+        return True, frame
+
+    def stop(self):
+        self._stop.set()
+        self._process.join(timeout=2.0)
+        if self._process.is_alive():
+            self._process.terminate()
+        # The name can go now; the mapping stays until our views are dropped
+        self.ring.unlink()
+        if not self.ring.close():
+            print(f"[{self.name}] {self.ring.views_in_use} frame(s) still in use, "
+                  "shared memory is released when they're dropped")
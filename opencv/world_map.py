@@ -0,0 +1,124 @@
+import cv2
+import numpy as np
+
+
+class Slot:
+    """
+    Where one camera goes on the world map, and the text drawn for it.
+    """
+    def __init__(self, label, x, y, label_pos, lost_pos):
+        self.label = label          # e.g. "CAM 1 (Left)", shown while the camera is live
+        self.x, self.y = x, y       # Top left corner of the camera image
+        self.label_pos = label_pos  # putText origin of the label
+        self.lost_pos = lost_pos    # putText origin of "SIGNAL LOST"
+
+
+# The 3-camera layout used by fusion_system.py and Vedio_recording_using_3_cameras.py
+THREE_CAM_LAYOUT = [
+    Slot("CAM 1 (Left)", 0, 100, (10, 50), (50, 200)),
+    Slot("CAM 2 (Center)", 340, 100, (350, 50), (390, 200)),
+    Slot("CAM 3 (Right)", 680, 100, (690, 50), (730, 200)),
+]
+
+
+class TextLayer:
+    """
+    A piece of putText rendered once onto a small black patch.
+    Pasting the patch gives the same pixels as calling putText on black.
+    """
+    def __init__(self, text, org, color, font=cv2.FONT_HERSHEY_SIMPLEX, scale=1, thickness=2):
+        (tw, th), baseline = cv2.getTextSize(text, font, scale, thickness)
+        pad = thickness + 2  # Anti-aliasing bleeds past the text box a little
+
+        self.x0 = org[0] - pad
+        self.y0 = org[1] - th - pad
+        self.patch = np.zeros((th + baseline + 2 * pad, tw + 2 * pad, 3), dtype=np.uint8)
+        cv2.putText(self.patch, text, (pad, th + pad), font, scale, color, thickness)
+
+    def region(self, canvas):
+        """
+        The canvas slice covered by this layer (clipped to the canvas).
+        """
+        h, w = canvas.shape[:2]
+        x0, y0 = max(self.x0, 0), max(self.y0, 0)
+        x1 = min(self.x0 + self.patch.shape[1], w)
+        y1 = min(self.y0 + self.patch.shape[0], h)
+        return canvas[y0:y1, x0:x1], self.patch[y0 - self.y0:y1 - self.y0, x0 - self.x0:x1 - self.x0]
+
+    def draw(self, canvas):
+        dst, src = self.region(canvas)
+        dst[:] = src
+
+    def clear(self, canvas):
+        dst, _ = self.region(canvas)
+        dst[:] = 0
+
+
+class WorldMapCompositor:
+    """
+    Builds the multi-camera "world map" without allocating per frame.
+
+    The canvas is allocated once. Camera frames are resized straight into
+    their canvas slot, and the label / SIGNAL LOST texts are rendered once
+    and only pasted (or cleared) when a slot switches between live and
+    lost - everything else on the canvas is left as it was.
+
+    NOTE: compose() returns the same canvas every call - copy it if you
+    need to keep a frame around.
+    """
+    def __init__(self, slots=THREE_CAM_LAYOUT, map_size=(1000, 600), cam_size=(320, 240)):
+        self.slots = slots
+        self.cam_w, self.cam_h = cam_size
+        map_w, map_h = map_size
+        self.canvas = np.zeros((map_h, map_w, 3), dtype=np.uint8)
+
+        self.labels = [TextLayer(s.label, s.label_pos, (0, 255, 0)) for s in slots]
+        self.lost = [TextLayer("SIGNAL LOST", s.lost_pos, (0, 0, 255)) for s in slots]
+
+        # Per slot: None (camera off), "live" or "lost"
+        self._state = [None] * len(slots)
+
+    def slot_view(self, i):
+        s = self.slots[i]
+        return self.canvas[s.y:s.y + self.cam_h, s.x:s.x + self.cam_w]
+
+    def compose(self, frames, active=None):
+        """
+        frames[i]: BGR frame for slot i, or None if that camera lost signal.
+        active[i]: False for cameras that were never opened (slot left black).
+        """
+        if active is None:
+            active = [True] * len(self.slots)
+
+        for i, (frame, on) in enumerate(zip(frames, active)):
+            state = None if not on else ("live" if frame is not None else "lost")
+            if state != self._state[i]:
+                self._switch(i, state)
+
+            if state == "live":
+                view = self.slot_view(i)
+                if frame.shape[1] == self.cam_w and frame.shape[0] == self.cam_h:
+                    view[:] = frame
+                else:
+                    # Safety resize: some cheap cameras ignore cap.set commands
+                    cv2.resize(frame, (self.cam_w, self.cam_h), dst=view)
+
+        return self.canvas
+
+    def _switch(self, i, state):
+        """
+        Repaints only the parts of slot i that depend on its state.
+        """
+        old = self._state[i]
+        if old == "live":
+            self.labels[i].clear(self.canvas)
+            self.slot_view(i)[:] = 0
+        elif old == "lost":
+            self.lost[i].clear(self.canvas)
+
+        if state == "live":
+            self.labels[i].draw(self.canvas)
+        elif state == "lost":
+            self.lost[i].draw(self.canvas)
+
+        self._state[i] = state